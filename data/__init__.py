@@ -4,5 +4,6 @@ from .localization import LocalizationManager  # Изменили импорт
 from .ui import UIManager
 from .commands import GitCommands
 from .manager import GitBranchManager
+from .export import DataExporter
 
-__all__ = ['ConfigManager', 'LocalizationManager', 'UIManager', 'GitCommands', 'GitBranchManager']
\ No newline at end of file
+__all__ = ['ConfigManager', 'LocalizationManager', 'UIManager', 'GitCommands', 'GitBranchManager', 'DataExporter']
\ No newline at end of file
@@ -0,0 +1,340 @@
+import os
+import re
+import subprocess
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+from functools import lru_cache
+from typing import Any, Dict, List, Optional, Tuple
+from .cache import RepoCache
+
+TASK_PATTERN = re.compile(r'([A-Z]+-\d+)')
+
+# Иконки типов conventional commits
+COMMIT_ICONS = {
+    "feat": "✨",
+    "fix": "🐛",
+    "docs": "📚",
+    "style": "🎨",
+    "refactor": "♻️",
+    "test": "🧪",
+    "chore": "🔧",
+    "build": "📦",
+    "ci": "⚙️",
+    "perf": "🚀",
+    "revert": "⏪"
+}
+
+# Один проход по сообщению: тип в начале (без учета регистра, через lookahead,
+# чтобы не съесть начало ключа задачи вроде TEST-12) и первый ключ задачи
+CLASSIFY_PATTERN = re.compile(
+    r'^(?:(?=(?P<type>(?i:' + '|'.join(COMMIT_ICONS) + r'))))?(?:.*?(?P<task>[A-Z]+-\d+))?',
+    re.DOTALL
+)
+
+# Разделитель записей %x1e позволяет отличить заголовок коммита от строк --numstat
+ANALYTICS_LOG_FORMAT = "--pretty=format:%x1e%H%x1f%an%x1f%at%x1f%s"
+
+
+def _empty_result() -> Dict[str, Any]:
+    return {"commits": 0, "authors": {}, "tasks": {}, "author_days": {}}
+
+
+def _analyze_range(work_dir: str, revs: List[str], days_since: Optional[int] = None, no_walk: bool = False) -> Dict[str, Any]:
+    """Разбирает один диапазон истории. Выполняется в отдельном процессе пула.
+
+    Ревизии передаются через --stdin, поэтому список из тысяч веток не
+    упирается в ограничение длины командной строки. С no_walk=True revs —
+    готовый список коммитов: git показывает ровно их, не обходя историю.
+    Если git завершился с ошибкой, поднимается RuntimeError с его stderr:
+    частичные счетчики выглядели бы правдоподобно, но были бы неверны.
+    """
+    result = _empty_result()
+    authors = result["authors"]
+    tasks = result["tasks"]
+    author_days = result["author_days"]
+
+    # stderr пишем во временный файл, чтобы переполненный пайп не заблокировал git
+    stderr_file = tempfile.TemporaryFile()
+    process = subprocess.Popen(
+        ["git", "log", "--stdin", "--ignore-missing", ANALYTICS_LOG_FORMAT, "--numstat"]
+        + (["--no-walk=unsorted"] if no_walk else []),
+        cwd=work_dir,
+        stdin=subprocess.PIPE,
+        stdout=subprocess.PIPE,
+        stderr=stderr_file,
+        text=True,
+        encoding='utf-8',
+        errors='replace'
+    )
+    # git читает весь stdin до начала обхода, поэтому запись целиком не блокирует вывод
+    process.stdin.write("\n".join(revs) + "\n")
+    process.stdin.close()
+
+    author_stats = day_stats = None
+    for line in process.stdout:
+        if line.startswith('\x1e'):
+            parts = line[1:].rstrip('\n').split('\x1f', 3)
+            if len(parts) < 4:
+                author_stats = day_stats = None
+                continue
+            _, author, timestamp, subject = parts
+            timestamp = int(timestamp) if timestamp.isdigit() else 0
+
+            author_stats = authors.setdefault(author, [0, 0, 0])
+            author_stats[0] += 1
+            result["commits"] += 1
+
+            day_stats = None
+            if days_since is not None and timestamp // 86400 >= days_since:
+                days = author_days.setdefault(author, {})
+                day_stats = days.setdefault(str(timestamp // 86400), [0, 0, 0])
+                day_stats[0] += 1
+
+            for task in set(TASK_PATTERN.findall(subject)):
+                task_stats = tasks.get(task)
+                if task_stats is None:
+                    tasks[task] = [1, timestamp, timestamp]
+                else:
+                    task_stats[0] += 1
+                    task_stats[1] = min(task_stats[1], timestamp)
+                    task_stats[2] = max(task_stats[2], timestamp)
+        elif author_stats is not None and line.strip():
+            added, deleted, _ = (line.split('\t', 2) + ['', ''])[:3]
+            added = int(added) if added.isdigit() else 0
+            deleted = int(deleted) if deleted.isdigit() else 0
+            author_stats[1] += added
+            author_stats[2] += deleted
+            if day_stats is not None:
+                day_stats[1] += added
+                day_stats[2] += deleted
+
+    with stderr_file:
+        if process.wait() != 0:
+            stderr_file.seek(0)
+            error = stderr_file.read().decode('utf-8', errors='replace').strip()
+            raise RuntimeError(error or f"git log exited with {process.returncode}")
+    return result
+
+
+def _merge_stats(target: List[int], stats: List[int]):
+    for i, value in enumerate(stats):
+        target[i] += value
+
+
+def _merge_results(target: Dict[str, Any], part: Dict[str, Any]):
+    """Сливает частичный результат диапазона в общий"""
+    target["commits"] += part["commits"]
+
+    for author, stats in part["authors"].items():
+        _merge_stats(target["authors"].setdefault(author, [0, 0, 0]), stats)
+
+    for task, stats in part["tasks"].items():
+        current = target["tasks"].get(task)
+        if current is None:
+            target["tasks"][task] = list(stats)
+        else:
+            current[0] += stats[0]
+            current[1] = min(current[1], stats[1])
+            current[2] = max(current[2], stats[2])
+
+    for author, days in part["author_days"].items():
+        target_days = target["author_days"].setdefault(author, {})
+        for day, stats in days.items():
+            _merge_stats(target_days.setdefault(day, [0, 0, 0]), stats)
+
+
+class HistoryAnalytics:
+    """Параллельный разбор большой истории: статистика авторов и индекс задач.
+
+    Список коммитов получается одним `git rev-list` и режется на куски;
+    каждый кусок разбирается своим `git log --no-walk` в отдельном процессе,
+    так что ни один процесс не обходит историю заново. Результаты затем
+    сливаются.
+    """
+
+    # Ниже этого порога накладные расходы пула процессов не окупаются
+    PARALLEL_THRESHOLD = 20000
+    RANGES_PER_WORKER = 4
+    # Сколько дней храним подневную статистику авторов для оконных агрегатов
+    DAYS_RETENTION = 365
+    DEFAULT_WINDOW_DAYS = 90
+
+    def __init__(self, config):
+        self.config = config
+        self.commit_cache = RepoCache(config, "commits", max_entries=4)
+        self.last_error = None  # type: Optional[str]
+
+    def _get_tips(self, work_dir: str) -> Optional[List[str]]:
+        """OID вершин всех локальных и remote-веток и HEAD; None, если это не репозиторий"""
+        result = subprocess.run(
+            ["git", "for-each-ref", "--format=%(objectname)", "refs/heads", "refs/remotes"],
+            cwd=work_dir,
+            capture_output=True,
+            text=True
+        )
+        if result.returncode != 0:
+            return None
+        head = subprocess.run(["git", "rev-parse", "--verify", "--quiet", "HEAD"], cwd=work_dir, capture_output=True, text=True)
+        tips = result.stdout.split() + head.stdout.split()
+        return list(dict.fromkeys(tips))
+
+    def _list_commits(self, work_dir: str, revs: List[str]) -> Optional[List[str]]:
+        """OID всех коммитов, достижимых из revs; None, если git завершился с ошибкой"""
+        result = subprocess.run(
+            ["git", "rev-list", "--stdin", "--ignore-missing"],
+            cwd=work_dir,
+            input="\n".join(revs) + "\n",
+            capture_output=True,
+            text=True
+        )
+        if result.returncode != 0:
+            self.last_error = result.stderr.strip() or None
+            return None
+        return result.stdout.split()
+
+    def _today(self) -> int:
+        return int(time.time()) // 86400
+
+    def collect(self, revs: Optional[List[str]] = None, workers: Optional[int] = None) -> Optional[Dict[str, Any]]:
+        current_settings = self.config.get_current_settings()
+        if not current_settings:
+            return None
+
+        work_dir = current_settings["WorkDir"]
+        self.last_error = None
+        revs = revs if revs is not None else self._get_tips(work_dir)
+        if revs is None:
+            return None
+        workers = workers or os.cpu_count() or 1
+        days_since = self._today() - self.DAYS_RETENTION
+        start_time = time.time()
+
+        commits = self._list_commits(work_dir, revs) if revs else []
+        if commits is None:
+            return None
+        total = len(commits)
+        result = _empty_result()
+
+        try:
+            self._analyze(work_dir, revs, commits, workers, days_since, result)
+        except RuntimeError as e:
+            # Неполный разбор не отдаем: update_stats запомнил бы вершины, и пропущенные коммиты не пересчитались бы
+            self.last_error = str(e)
+            return None
+
+        result["workers"] = workers if total >= self.PARALLEL_THRESHOLD and workers > 1 else 1
+        result["elapsed"] = time.time() - start_time
+        return result
+
+    def _analyze(self, work_dir: str, revs: List[str], commits: List[str], workers: int,
+                 days_since: int, result: Dict[str, Any]):
+        """Разбирает коммиты последовательно или пулом процессов, сливая итог в result"""
+        total = len(commits)
+        if total == 0:
+            return
+        if workers <= 1 or total < self.PARALLEL_THRESHOLD:
+            _merge_results(result, _analyze_range(work_dir, revs, days_since))
+        else:
+            # Диапазонов больше, чем процессов: неравномерные по стоимости куски балансируются сами
+            range_count = workers * self.RANGES_PER_WORKER
+            range_size = -(-total // range_count)
+            with ProcessPoolExecutor(max_workers=workers) as pool:
+                futures = [
+                    pool.submit(_analyze_range, work_dir, commits[start:start + range_size], days_since, True)
+                    for start in range(0, total, range_size)
+                ]
+                for future in futures:
+                    _merge_results(result, future.result())
+
+    def update_stats(self, workers: Optional[int] = None) -> Optional[Dict[str, Any]]:
+        """Обновляет накопленную статистику только по коммитам, появившимся с прошлого раза.
+
+        В кеше хранятся вершины веток, на которых остановился прошлый разбор:
+        новые коммиты — это всё, что достижимо из текущих вершин, но не из
+        сохраненных (`git log <новые> ^<старые>`).
+        """
+        current_settings = self.config.get_current_settings()
+        if not current_settings:
+            return None
+
+        work_dir = current_settings["WorkDir"]
+        start_time = time.time()
+        cached = self.commit_cache.get("stats")
+        tips = self._get_tips(work_dir)
+        if tips is None:
+            return None
+        old_tips = set(cached["tips"]) if cached else set()
+
+        if cached and set(tips) <= old_tips:
+            return dict(cached, new_commits=0, workers=0, elapsed=time.time() - start_time)
+
+        new_tips = [tip for tip in tips if tip not in old_tips]
+        fresh = self.collect(new_tips + [f"^{tip}" for tip in old_tips], workers)
+        if fresh is None:
+            return None
+        stats = cached or _empty_result()
+        _merge_results(stats, fresh)
+
+        # Подневные агрегаты старше окна хранения больше не нужны
+        days_since = self._today() - self.DAYS_RETENTION
+        for author, days in list(stats["author_days"].items()):
+            stats["author_days"][author] = {day: value for day, value in days.items() if int(day) >= days_since}
+
+        stats["tips"] = tips
+        stats["new_commits"] = fresh["commits"]
+        stats.pop("workers", None)
+        stats.pop("elapsed", None)
+        self.commit_cache.set("stats", stats)
+
+        return dict(stats, workers=fresh["workers"], elapsed=time.time() - start_time)
+
+    def get_author_summary(self, branch_data: List[Dict[str, Any]], stats: Optional[Dict[str, Any]] = None,
+                           window_days: Optional[int] = None) -> Dict[str, Dict[str, int]]:
+        """Агрегаты по авторам: коммиты, строки за окно и число веток, где автор владеет вершиной"""
+        window_days = window_days or self.DEFAULT_WINDOW_DAYS
+        stats = stats or self.update_stats()
+        if not stats:
+            return {}
+
+        window_start = self._today() - window_days
+        summary = {}
+        for author, (commits, added, deleted) in stats["authors"].items():
+            window = [0, 0, 0]
+            for day, day_stats in stats["author_days"].get(author, {}).items():
+                if int(day) >= window_start:
+                    _merge_stats(window, day_stats)
+            summary[author] = {
+                "commits": commits,
+                "added": added,
+                "deleted": deleted,
+                "window_commits": window[0],
+                "window_added": window[1],
+                "window_deleted": window[2],
+                "branches": 0
+            }
+
+        empty = dict.fromkeys(("commits", "added", "deleted", "window_commits", "window_added", "window_deleted", "branches"), 0)
+        for branch in branch_data:
+            summary.setdefault(branch["author"], dict(empty))["branches"] += 1
+
+        return summary
+
+
+class CommitClassifier:
+    """Классификация коммитов для отображения лога: тип коммита и позиция ключа задачи.
+
+    Одно сообщение разбирается одним совпадением CLASSIFY_PATTERN, и это
+    дешевле любого кеша на диске; повторы в пределах сессии берутся из
+    lru_cache в памяти.
+    """
+
+    @staticmethod
+    @lru_cache(maxsize=4096)
+    def classify_message(message: str) -> Tuple[str, int, int]:
+        match = CLASSIFY_PATTERN.match(message)
+        return (match.group("type") or "").lower(), match.start("task"), match.end("task")
+
+    def classify(self, records: List[Dict[str, Any]]) -> List[Tuple[str, int, int]]:
+        """Возвращает (тип, начало задачи, конец задачи) для каждой записи (-1, если задачи нет)"""
+        return [self.classify_message(record["message"]) for record in records]
@@ -0,0 +1,183 @@
+import hashlib
+import json
+import os
+import subprocess
+import tempfile
+import threading
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Any, Dict, Iterator, Optional
+
+
+def atomic_write_json(path: Path, data: Any, indent: Optional[int] = None):
+    """Записывает JSON во временный файл и атомарно подменяет им целевой"""
+    path.parent.mkdir(parents=True, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=path.parent, prefix=f".{path.name}.", suffix=".tmp")
+    try:
+        with os.fdopen(fd, 'w', encoding='utf-8') as f:
+            json.dump(data, f, indent=indent, ensure_ascii=False)
+        os.replace(tmp_path, path)
+    except Exception:
+        try:
+            os.unlink(tmp_path)
+        except OSError:
+            pass
+        raise
+
+
+@contextmanager
+def file_lock(path: Path, blocking: bool = True) -> Iterator[bool]:
+    """Межпроцессная эксклюзивная блокировка на файле.
+
+    Отдает True, если блокировка получена; с blocking=False отдает False,
+    когда файл уже заблокирован другим процессом (или потоком).
+    """
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with open(path, 'a+b') as f:
+        try:
+            if os.name == 'nt':
+                import msvcrt
+                f.seek(0)
+                msvcrt.locking(f.fileno(), msvcrt.LK_LOCK if blocking else msvcrt.LK_NBLCK, 1)
+            else:
+                import fcntl
+                fcntl.flock(f.fileno(), fcntl.LOCK_EX if blocking else fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            if blocking:
+                raise
+            yield False
+            return
+        try:
+            yield True
+        finally:
+            if os.name == 'nt':
+                f.seek(0)
+                msvcrt.locking(f.fileno(), msvcrt.LK_UNLCK, 1)
+            # flock снимается при закрытии файла
+
+
+def directory_size(path: str) -> int:
+    """Размер дерева файлов на диске (симлинки не раскрываются)"""
+    total = 0
+    stack = [path]
+    while stack:
+        try:
+            with os.scandir(stack.pop()) as entries:
+                for entry in entries:
+                    try:
+                        if entry.is_dir(follow_symlinks=False):
+                            stack.append(entry.path)
+                        else:
+                            total += entry.stat(follow_symlinks=False).st_size
+                    except OSError:
+                        continue
+        except OSError:
+            continue
+    return total
+
+
+def repo_root(work_dir: str) -> str:
+    """Основной каталог репозитория: общий для всех его worktree.
+
+    Для обычного клона это каталог с .git, поэтому ключи кешей основного
+    дерева остаются прежними; для bare-репозитория — сам git-каталог.
+    """
+    work_dir = os.path.abspath(work_dir)
+    root = _repo_roots.get(work_dir)
+    if root is None:
+        try:
+            result = subprocess.run(["git", "rev-parse", "--path-format=absolute", "--git-common-dir"],
+                                    cwd=work_dir, capture_output=True, text=True)
+            common_dir = result.stdout.strip() if result.returncode == 0 else ""
+        except OSError:
+            common_dir = ""
+        if not common_dir:
+            root = work_dir
+        elif os.path.basename(common_dir) == ".git":
+            root = os.path.dirname(common_dir)
+        else:
+            root = common_dir
+        _repo_roots[work_dir] = root
+    return root
+
+
+_repo_roots = {}  # type: Dict[str, str]
+
+
+class RepoCache:
+    """Персистентный кеш с привязкой к репозиторию текущего профиля.
+
+    Кеш общий для всех worktree репозитория; per_worktree=True отдает
+    каждому рабочему дереву свой кеш (для состояния самих файлов дерева,
+    например node_modules).
+    """
+
+    def __init__(self, config, name: str, max_entries: int = 256, per_worktree: bool = False):
+        self.config = config
+        self.name = name
+        self.max_entries = max_entries
+        self.per_worktree = per_worktree
+        # Кешем пользуются и фоновые потоки: запись не должна идти во время сериализации
+        self._lock = threading.RLock()
+        self._data = {}  # type: Dict[Path, Dict[str, Any]]
+
+    def _cache_file(self, work_dir: str) -> Path:
+        path = os.path.abspath(work_dir) if self.per_worktree else repo_root(work_dir)
+        repo_key = hashlib.sha1(path.encode('utf-8')).hexdigest()[:16]
+        return self.config.cache_dir / repo_key / f"{self.name}.json"
+
+    def _current_work_dir(self) -> Optional[str]:
+        current_settings = self.config.get_current_settings()
+        return current_settings["WorkDir"] if current_settings else None
+
+    def _entries(self, work_dir: Optional[str] = None) -> Dict[str, Any]:
+        """Лениво загружает записи кеша для репозитория (по умолчанию — текущего профиля); вызывается под блокировкой"""
+        work_dir = work_dir or self._current_work_dir()
+        if work_dir is None:
+            return {}
+
+        # Ключ — файл кеша: worktree одного репозитория делят одни и те же записи
+        cache_file = self._cache_file(work_dir)
+        if cache_file not in self._data:
+            try:
+                with open(cache_file, 'r', encoding='utf-8') as f:
+                    self._data[cache_file] = json.load(f)
+            except (OSError, ValueError):
+                self._data[cache_file] = {}
+        return self._data[cache_file]
+
+    def get(self, key: str, default: Any = None, work_dir: Optional[str] = None) -> Any:
+        with self._lock:
+            return self._entries(work_dir).get(key, default)
+
+    def set(self, key: str, value: Any, work_dir: Optional[str] = None):
+        """Сохраняет значение, вытесняя самые старые записи сверх лимита"""
+        self.update({key: value}, work_dir)
+
+    def update(self, values: Dict[str, Any], work_dir: Optional[str] = None):
+        """Сохраняет пачку значений одной записью на диск.
+
+        work_dir задает репозиторий явно: фоновая задача должна писать туда,
+        где начиналась, даже если пользователь успел сменить профиль.
+        """
+        with self._lock:
+            entries = self._entries(work_dir)
+            for key, value in values.items():
+                entries.pop(key, None)
+                entries[key] = value
+            while len(entries) > self.max_entries:
+                del entries[next(iter(entries))]
+            self.save(work_dir)
+
+    def save(self, work_dir: Optional[str] = None):
+        work_dir = work_dir or self._current_work_dir()
+        if work_dir is None:
+            return
+        with self._lock:
+            cache_file = self._cache_file(work_dir)
+            if cache_file not in self._data:
+                return
+            try:
+                atomic_write_json(cache_file, self._data[cache_file])
+            except (OSError, TypeError, ValueError) as e:
+                print(f"Error saving cache {self.name}: {e}")
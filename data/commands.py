@@ -1,16 +1,105 @@
 import os
 import subprocess
 import re
-import json
 import time
-from typing import Optional, List, Dict, Any
+import heapq
+import tempfile
+from collections import deque
+from typing import Optional, List, Dict, Any, Iterator, Callable, Tuple
 from .localization import LocalizationManager
+from .cache import RepoCache
+from .scripts import ScriptIndex
+from .npm import (changed_workspaces, dependency_hash, detect_package_manager, install_strategy,
+                  node_modules_intact, run_install, NodeModulesStore, StagedInstall)
+
+# Строка прогресса git: "Receiving objects:  45% (9/20), 1.20 MiB | 2.00 MiB/s"
+GIT_PROGRESS_PATTERN = re.compile(
+    r'^(?:remote: )?(?P<phase>[A-Za-z ]+): +(?P<percent>\d+)% \((?P<done>\d+)/(?P<total>\d+)\)'
+    r'(?:, (?P<size>[\d.]+ [KMGT]?i?B) \| (?P<rate>[\d.]+ [KMGT]?i?B/s))?'
+)
+
+def _handle_progress_line(line: str, on_progress: Optional[Callable[..., None]], tail: deque):
+    line = line.strip()
+    if not line:
+        return
+    match = GIT_PROGRESS_PATTERN.match(line)
+    if match:
+        if on_progress:
+            on_progress(match.group("phase"), int(match.group("percent")), match.group("size"), match.group("rate"))
+    else:
+        tail.append(line)
+
+
+def run_git_progress(args: List[str], cwd: str, on_progress: Optional[Callable[..., None]] = None,
+                     env: Optional[Dict[str, str]] = None) -> Tuple[int, str]:
+    """Запускает git-команду и разбирает её stderr по мере поступления.
+
+    Git пишет прогресс через \\r, поэтому stderr читается кусками, а не
+    построчно. Строки прогресса передаются в on_progress(phase, percent,
+    size, rate), остальной вывод копится в ограниченный хвост для ошибок.
+    Возвращает код возврата и этот хвост.
+    """
+    # Фазы прогресса разбираем по английским названиям, поэтому отключаем перевод сообщений git
+    process_env = dict(os.environ, LC_ALL="C", LANGUAGE="")
+    process_env.update(env or {})
+    try:
+        process = subprocess.Popen(
+            ["git"] + args,
+            cwd=cwd,
+            stdin=subprocess.DEVNULL,
+            stdout=subprocess.DEVNULL,
+            stderr=subprocess.PIPE,
+            env=process_env
+        )
+    except OSError as e:
+        return 1, str(e)
+
+    tail = deque(maxlen=20)
+    pending = b""
+    while True:
+        chunk = process.stderr.read1(4096)
+        if not chunk:
+            break
+        *segments, pending = re.split(rb'[\r\n]', pending + chunk)
+        for segment in segments:
+            _handle_progress_line(segment.decode('utf-8', errors='replace'), on_progress, tail)
+
+    _handle_progress_line(pending.decode('utf-8', errors='replace'), on_progress, tail)
+    process.wait()
+    return process.returncode, "\n".join(tail)
+
+
+def resolve_default_branch(work_dir: str, remote: str = "origin") -> str:
+    """Основная ветка remote: по refs/remotes/<remote>/HEAD, иначе main или master.
+
+    Ничего не выводит, поэтому годится и для фоновых потоков.
+    """
+    def git(*args: str) -> str:
+        try:
+            result = subprocess.run(["git"] + list(args), cwd=work_dir, capture_output=True, text=True)
+        except OSError:
+            return ""
+        return result.stdout.strip() if result.returncode == 0 else ""
+
+    head = git("symbolic-ref", f"refs/remotes/{remote}/HEAD")
+    if head:
+        return head[len(f"refs/remotes/{remote}/"):]
+    if git("rev-parse", "--verify", "--quiet", f"refs/remotes/{remote}/main"):
+        return 'main'
+    return 'master'
+
 
 class GitCommands:
     def __init__(self, config, locale, ui):
         self.config = config
         self.locale = locale
         self.ui = ui
+        self.compare_cache = RepoCache(config, "compare")
+        self.fetch_timings = RepoCache(config, "fetch_timings", max_entries=8)
+        self.npm_state = RepoCache(config, "npm_install", max_entries=8, per_worktree=True)
+        self.node_modules_store = NodeModulesStore(config)
+        self.script_index = ScriptIndex(config)
+        self.ssh = None  # SshMultiplexer, устанавливается менеджером
 
     def run_git_command(self, command: str, check: bool = False, cwd: Optional[str] = None) -> Optional[str]:
         try:
@@ -46,57 +135,308 @@ class GitCommands:
             self.ui.show_error(self.locale.tr('errors.git_command_failed').format(e.stderr.strip()))
             return None
 
+    def stream_git_command(self, args: List[str], check: bool = False) -> Iterator[str]:
+        """Построчно отдает вывод git-команды, не буферизуя его целиком.
+
+        С check=True ошибка git не выводится, а поднимается как
+        CalledProcessError: вызывающему коду (например, экспорту) нужно
+        отличить неполный вывод от полного.
+        """
+        current_settings = self.config.get_current_settings()
+        if not current_settings:
+            self.ui.show_error(self.locale.tr('errors.no_active_profile'))
+            return
+
+        working_dir = current_settings["WorkDir"]
+        if not os.path.isdir(working_dir):
+            if check:
+                raise NotADirectoryError(self.locale.tr('errors.directory_not_exists').format(working_dir))
+            self.ui.show_error(self.locale.tr('errors.directory_not_exists').format(working_dir))
+            return
+
+        # stderr пишем во временный файл, чтобы переполненный пайп не заблокировал git
+        with tempfile.TemporaryFile() as stderr_file:
+            process = subprocess.Popen(
+                ["git", "-c", "core.quotepath=false"] + args,
+                cwd=working_dir,
+                stdout=subprocess.PIPE,
+                stderr=stderr_file,
+                text=True,
+                encoding='utf-8',
+                errors='replace'
+            )
+            try:
+                for line in process.stdout:
+                    yield line.rstrip('\n')
+            finally:
+                process.stdout.close()
+                if process.poll() is None:
+                    process.kill()
+                process.wait()
+
+            if process.returncode != 0:
+                stderr_file.seek(0)
+                error = stderr_file.read().decode('utf-8', errors='replace').strip()
+                if check:
+                    raise subprocess.CalledProcessError(process.returncode, ["git"] + args, stderr=error)
+                self.ui.show_error(self.locale.tr('errors.git_command_failed').format(error or self.locale.tr('errors.unknown')))
+
+    def run_git_with_progress(self, args: List[str], on_progress: Optional[Callable[..., None]] = None,
+                              remote: Optional[str] = None, env: Optional[Dict[str, str]] = None) -> Tuple[int, str]:
+        """Запускает git-команду в рабочей директории профиля с разбором прогресса.
+
+        Для сетевых команд remote позволяет подключить общее SSH-соединение,
+        env добавляет переменные окружения (например, пропуск smudge LFS).
+        """
+        current_settings = self.config.get_current_settings()
+        if not current_settings:
+            return 1, self.locale.tr('errors.no_active_profile')
+
+        env = dict(env or {})
+        if remote and self.ssh:
+            env.update(self.ssh.git_env(current_settings["WorkDir"], remote))
+        return run_git_progress(args, current_settings["WorkDir"], on_progress, env)
+
+    def fetch_branches(self, branches: List[str], on_progress: Optional[Callable[..., None]] = None) -> Dict[str, Any]:
+        """Скачивает с remote только нужные ветки (или всё, если в профиле FetchMode=full).
+
+        Целевой refspec `+refs/heads/<b>:refs/remotes/<remote>/<b>` не тянет
+        объекты остальных веток remote. Список ссылок сервер по протоколу
+        v0/v1 все равно присылает целиком; сузить его может только
+        ls-refs протокола v2.
+        """
+        current_settings = self.config.get_current_settings()
+        if not current_settings:
+            self.ui.show_error(self.locale.tr('errors.no_active_profile'))
+            return {"ok": False, "mode": None, "elapsed": 0.0}
+
+        remote = current_settings.get("Remote", "origin")
+        mode = self.config.get_option("FetchMode")
+        args = ["fetch", "--progress", remote]
+        if mode != "full":
+            mode = "targeted"
+            args += [f"+refs/heads/{branch}:refs/remotes/{remote}/{branch}" for branch in branches]
+
+        start_time = time.time()
+        returncode, output = self.run_git_with_progress(args, on_progress, remote=remote)
+        elapsed = time.time() - start_time
+
+        if returncode != 0:
+            self.ui.show_error(self.locale.tr('errors.git_command_failed').format(output or self.locale.tr('errors.unknown')))
+            return {"ok": False, "mode": mode, "elapsed": elapsed}
+
+        self.fetch_timings.set(mode, elapsed)
+        return {"ok": True, "mode": mode, "elapsed": elapsed, "full_elapsed": self.fetch_timings.get("full")}
+
     def get_current_branch(self) -> Optional[str]:
         return self.run_git_command("branch --show-current")
 
     def _get_default_branch(self) -> str:
         """Определяет основную ветку (master или main)"""
-        try:
-            current_settings = self.config.get_current_settings()
-            if not current_settings:
-                return 'master'
-                
-            result = self.run_git_command("symbolic-ref refs/remotes/origin/HEAD")
-            if result:
-                return result.split('/')[-1]
-
-            branches = self.run_git_command("branch -a")
-            if 'origin/main' in branches:
-                return 'main'
-            return 'master'
-        except:
+        current_settings = self.config.get_current_settings()
+        if not current_settings or not os.path.isdir(current_settings["WorkDir"]):
             return 'master'
+        return resolve_default_branch(current_settings["WorkDir"], current_settings.get("Remote", "origin"))
+
+    BRANCH_FORMAT = "%(refname:short)|%(committerdate:relative)|%(committerdate:unix)|%(upstream:short)|%(authorname)"
+    BRANCH_FIELDS = ["local_branch", "last_commit_relative", "last_commit_timestamp", "remote_branch", "author"]
+    LOG_FIELDS = ["hash", "short_hash", "author", "email", "date", "timestamp", "message", "refs"]
+
+    def _parse_branch_line(self, line: str) -> Dict[str, Any]:
+        parts = line.split('|')
+        local = parts[0].strip() if parts[0] else ""
+        commit_relative = parts[1].strip() if parts[1] else ""
+        commit_timestamp = int(parts[2]) if parts[2] else 0
+        remote = (parts[3].replace('origin/', '').strip() if parts[3] else "")
+        author = parts[4].strip() if parts[4] else "unknown"
+
+        return {
+            "local_branch": local,
+            "last_commit_relative": commit_relative,
+            "last_commit_timestamp": commit_timestamp,
+            "remote_branch": remote,
+            "author": author
+        }
+
+    def iter_branch_records(self, check: bool = False) -> Iterator[Dict[str, Any]]:
+        """Потоково отдает данные о локальных ветках"""
+        for line in self.stream_git_command(["for-each-ref", f"--format={self.BRANCH_FORMAT}", "refs/heads/"], check=check):
+            if line:
+                yield self._parse_branch_line(line)
+
+    def iter_log_records(self, since: Optional[str] = None, until: Optional[str] = None,
+                         max_count: Optional[int] = None, check: bool = False) -> Iterator[Dict[str, Any]]:
+        """Потоково отдает коммиты всех веток, не загружая историю в память"""
+        args = [
+            "log",
+            "--all",
+            "--pretty=format:%H%x1f%h%x1f%an%x1f%ae%x1f%ad%x1f%at%x1f%s%x1f%D",
+            "--date=iso-strict"
+        ]
+        if since:
+            args.append(f"--since={since}")
+        if until:
+            args.append(f"--until={until}")
+        if max_count:
+            args.append(f"-n{max_count}")
+
+        for line in self.stream_git_command(args, check=check):
+            parts = line.split('\x1f')
+            if len(parts) < len(self.LOG_FIELDS):
+                continue
+            record = dict(zip(self.LOG_FIELDS, parts))
+            record["timestamp"] = int(record["timestamp"]) if record["timestamp"].isdigit() else 0
+            yield record
 
     def _get_branch_data(self) -> List[Dict[str, Any]]:
         """Получает данные о ветках"""
-        raw_branches = self.run_git_command(
-            "for-each-ref --format=%(refname:short)|%(committerdate:relative)|%(committerdate:unix)|%(upstream:short)|%(authorname) refs/heads/"
+        return sorted(self.iter_branch_records(), key=lambda x: x["last_commit_timestamp"], reverse=True)
+
+    def _resolve_commit(self, ref: str) -> Optional[str]:
+        """Возвращает полный OID коммита для ссылки"""
+        result = subprocess.run(
+            ["git", "rev-parse", "--verify", "--quiet", f"{ref}^{{commit}}"],
+            cwd=self.config.get_current_settings()["WorkDir"],
+            capture_output=True,
+            text=True
         )
+        return result.stdout.strip() if result.returncode == 0 else None
+
+    def _get_compare_base(self) -> str:
+        """Ветка, с которой сравниваются остальные: remote-версия основной ветки, если она есть"""
+        default_branch = self._get_default_branch()
+        remote = self.config.get_current_settings().get("Remote", "origin")
+        remote_ref = f"{remote}/{default_branch}"
+        return remote_ref if self._resolve_commit(remote_ref) else default_branch
+
+    def compare_branches(self, branch: str, base: Optional[str] = None) -> Optional[Dict[str, Any]]:
+        """Сравнивает ветку с основной: уникальные коммиты каждой стороны и diffstat.
 
-        if not raw_branches:
-            return []
-
-        branch_data = []
-        for line in raw_branches.split('\n'):
-            parts = line.split('|')
-            local = parts[0].strip() if parts[0] else ""
-            commit_relative = parts[1].strip() if parts[1] else ""
-            commit_timestamp = int(parts[2]) if parts[2] else 0
-            remote = (parts[3].replace('origin/', '').strip() if parts[3] else "")
-            author = parts[4].strip() if parts[4] else "unknown"
-
-            branch_data.append({
-                "local_branch": local,
-                "last_commit_relative": commit_relative,
-                "last_commit_timestamp": commit_timestamp,
-                "remote_branch": remote,
-                "author": author
+        Результаты кешируются по паре (merge-base, tip): для неизменных OID
+        повторный просмотр не запускает git log/diff.
+        """
+        if not self.config.get_current_settings():
+            self.ui.show_error(self.locale.tr('errors.no_active_profile'))
+            return None
+
+        base = base or self._get_compare_base()
+        tip = self._resolve_commit(branch)
+        base_tip = self._resolve_commit(base)
+        if not tip or not base_tip:
+            self.ui.show_error(self.locale.tr('errors.git_command_failed').format(branch if not tip else base))
+            return None
+
+        merge_base = self.run_git_command(f"merge-base {base_tip} {tip}")
+        if not merge_base:
+            self.ui.show_error(self.locale.tr('compare.no_merge_base').format(branch, base))
+            return None
+
+        side_keys = {
+            "<": f"side:{merge_base}:{base_tip}",
+            ">": f"side:{merge_base}:{tip}"
+        }
+        sides = {mark: self.compare_cache.get(key) for mark, key in side_keys.items()}
+        diff_key = f"numstat:{merge_base}:{tip}"
+        diffstat = self.compare_cache.get(diff_key)
+        cached = diffstat is not None and all(side is not None for side in sides.values())
+
+        missing = [mark for mark, side in sides.items() if side is None]
+        if missing:
+            collected = self._collect_compare_sides(base_tip, tip, merge_base, missing)
+            for mark in missing:
+                sides[mark] = collected[mark]
+                self.compare_cache.set(side_keys[mark], collected[mark])
+
+        if diffstat is None:
+            diffstat = self._collect_numstat(merge_base, tip)
+            self.compare_cache.set(diff_key, diffstat)
+
+        return {
+            "branch": branch,
+            "base": base,
+            "merge_base": merge_base,
+            "behind": sides["<"],
+            "ahead": sides[">"],
+            "diffstat": diffstat,
+            "cached": cached
+        }
+
+    COMPARE_COMMIT_LIMIT = 50
+    COMPARE_FILE_LIMIT = 40
+
+    def _collect_compare_sides(self, base_tip: str, tip: str, merge_base: str, marks: List[str]) -> Dict[str, Dict[str, Any]]:
+        """Потоково собирает уникальные коммиты сторон через --left-right"""
+        if len(marks) == 2:
+            args = ["log", "--left-right", "--pretty=format:%m|%h|%s|%an|%ad", f"{base_tip}...{tip}"]
+        else:
+            side_tip = base_tip if marks[0] == "<" else tip
+            args = ["log", f"--pretty=format:{marks[0]}|%h|%s|%an|%ad", f"{merge_base}..{side_tip}"]
+        args.insert(1, "--date=format:%Y-%m-%d %H:%M")
+
+        sides = {mark: {"count": 0, "commits": []} for mark in marks}
+        for line in self.stream_git_command(args):
+            parts = line.split('|', 4)
+            if len(parts) < 5 or parts[0] not in sides:
+                continue
+            side = sides[parts[0]]
+            side["count"] += 1
+            if len(side["commits"]) < self.COMPARE_COMMIT_LIMIT:
+                side["commits"].append({
+                    "hash": parts[1],
+                    "message": parts[2],
+                    "author": parts[3],
+                    "date": parts[4]
+                })
+        return sides
+
+    def _collect_numstat(self, merge_base: str, tip: str) -> Dict[str, Any]:
+        """Потоково считает diffstat, храня в памяти только самые крупные файлы"""
+        total_files = added = deleted = 0
+        largest = []  # куча (изменено строк, порядковый номер, запись)
+
+        for line in self.stream_git_command(["diff", "--numstat", merge_base, tip]):
+            parts = line.split('\t', 2)
+            if len(parts) < 3:
+                continue
+            binary = parts[0] == '-'
+            file_added = 0 if binary else int(parts[0])
+            file_deleted = 0 if binary else int(parts[1])
+            total_files += 1
+            added += file_added
+            deleted += file_deleted
+
+            entry = (file_added + file_deleted, total_files, {
+                "path": parts[2],
+                "added": file_added,
+                "deleted": file_deleted,
+                "binary": binary
             })
+            if len(largest) < self.COMPARE_FILE_LIMIT:
+                heapq.heappush(largest, entry)
+            else:
+                heapq.heappushpop(largest, entry)
+
+        return {
+            "files": [entry[2] for entry in sorted(largest, reverse=True)],
+            "total_files": total_files,
+            "added": added,
+            "deleted": deleted
+        }
+
+    def _run_npm_install(self, old_head: Optional[str] = None):
+        """Устанавливает зависимости текущей директории.
 
-        return sorted(branch_data, key=lambda x: x["last_commit_timestamp"], reverse=True)
+        Менеджер пакетов (npm, pnpm, yarn) определяется по lock-файлу, команда
+        выбирается самая быстрая из корректных (см. install_strategy), время
+        каждой стратегии копится в статистике.
 
-    def _run_npm_install(self):
-        """Выполняет npm install в текущей директории"""
+        Установка пропускается, если package.json и lock-файл не менялись с
+        последней успешной установки в этой WorkDir и node_modules на месте.
+        Если для этого набора зависимостей есть снимок node_modules, он
+        восстанавливается вместо установки. С old_head в монорепозитории на
+        npm workspaces устанавливаются только workspaces, изменившиеся с
+        этого коммита (см. changed_workspaces).
+        """
         current_settings = self.config.get_current_settings()
         if not current_settings:
             self.ui.show_error(self.locale.tr('errors.no_active_profile'))
@@ -108,63 +448,127 @@ class GitCommands:
         if not os.path.isfile(package_json):
             return
 
-        self.ui.show_info(self.locale.tr('npm.installing'))
-        npm_cmd = "npm.cmd" if os.name == 'nt' else "npm"
+        current_hash = dependency_hash(work_dir)
+        if current_hash == self.npm_state.get("installed_hash") and node_modules_intact(work_dir):
+            self.ui.show_success(self.locale.tr('npm.up_to_date'))
+            return
 
-        with self.ui.create_progress() as progress:
-            task = progress.add_task("[cyan]Running npm install...", total=100)
-            
-            # Запускаем процесс
-            process = subprocess.Popen(
-                [npm_cmd, "install", "--no-audit", "--progress=false"],
-                cwd=work_dir,
-                stdout=subprocess.PIPE,
-                stderr=subprocess.PIPE,
-                text=True,
-                bufsize=1,  # построчная буферизация
-                universal_newlines=True
-            )
+        if self.node_modules_store.restore(work_dir, current_hash):
+            self.npm_state.set("installed_hash", current_hash)
+            self.ui.show_success(self.locale.tr('npm.restored'))
+            return
 
-            # Плавная анимация прогресса
-            start_time = time.time()
-            last_update = 0
-            while process.poll() is None:
-                elapsed = time.time() - start_time
-                # Обновляем прогресс каждые 0.1 секунды
-                if elapsed - last_update >= 0.1:
-                    # Плавное заполнение до 90% за 30 секунд
-                    progress_percent = min(90, int(elapsed * 2))
-                    progress.update(task, completed=progress_percent)
-                    last_update = elapsed
-                time.sleep(0.05)
-
-            # После завершения устанавливаем 100%
-            progress.update(task, completed=100)
+        cache_dir = self._package_cache_dir(work_dir)
+        workspaces = None
+        if old_head and detect_package_manager(work_dir)[0] == "npm" and node_modules_intact(work_dir):
+            workspaces = changed_workspaces(work_dir, old_head, "HEAD")
+        strategy = install_strategy(work_dir, cache_dir, workspaces=workspaces)
+        if not strategy:
+            self.ui.show_error(self.locale.tr('npm.manager_missing').format(detect_package_manager(work_dir)[0]))
+            return
 
-        if process.returncode == 0:
-            self.ui.show_success(self.locale.tr('npm.installed'))
+        self.ui.show_info(self.locale.tr('npm.installing'))
+        if workspaces:
+            self.ui.console.print(f"[dim]{self.locale.tr('npm.workspaces').format(', '.join(workspaces))}[/dim]")
+        start_time = time.time()
+        returncode, output, timings = self._run_install_strategy(strategy, work_dir)
+        if returncode != 0 and (workspaces or strategy["name"].startswith("npm ci")):
+            # npm ci отказывается работать, если lock-файл не согласован с package.json;
+            # после неудачной выборочной установки тоже ставим все дерево
+            strategy = install_strategy(work_dir, cache_dir, clean=False)
+            returncode, output, timings = self._run_install_strategy(strategy, work_dir)
+        elapsed = time.time() - start_time
+
+        if returncode == 0:
+            self._record_install(work_dir, strategy["name"], elapsed, timings)
         else:
-            error_output = process.stderr.read()
-            if error_output:
-                self.ui.show_error(error_output)
+            if output:
+                self.ui.show_error(output)
             self.ui.show_error(self.locale.tr('npm.failed'))
-            
-    def get_npm_scripts(self) -> Optional[Dict[str, str]]:
-        """Получает npm-скрипты из package.json"""
+
+    def _package_cache_dir(self, work_dir: str) -> Optional[str]:
+        """Локальный кеш пакетов, если он включен настройкой LocalPackageCache"""
+        if not self.config.get_option("LocalPackageCache"):
+            return None
+        return str(self.config.cache_dir / "packages" / detect_package_manager(work_dir)[0])
+
+    def _record_install(self, work_dir: str, strategy_name: str, elapsed: float, timings: Dict[str, int]):
+        """Запоминает успешную установку и показывает ее время"""
+        # Хеш считаем после установки: npm install может переписать package-lock.json
+        installed_hash = dependency_hash(work_dir)
+        self.npm_state.set("installed_hash", installed_hash)
+        self.node_modules_store.save(work_dir, installed_hash)
+        self.ui.show_success(self.locale.tr('npm.installed'))
+
+        strategy_timings = self.npm_state.get("strategy_timings", {})
+        stats = strategy_timings.setdefault(strategy_name, {"runs": 0, "total": 0.0})
+        stats["runs"] += 1
+        stats["total"] += elapsed
+        stats["last"] = elapsed
+        self.npm_state.set("strategy_timings", strategy_timings)
+        self.ui.console.print(f"[dim]{self.locale.tr('npm.strategy').format(strategy_name, elapsed, stats['total'] / stats['runs'], stats['runs'])}[/dim]")
+        if "npm" in timings:
+            self.ui.console.print(f"[dim]{self.locale.tr('npm.timing').format(timings.get('idealTree', 0), timings.get('reify', 0), timings['npm'])}[/dim]")
+
+    def start_staged_install(self, ref: str) -> Optional[StagedInstall]:
+        """Запускает npm ci для ref в фоне, пока идет checkout; None, если это не нужно или невозможно"""
         current_settings = self.config.get_current_settings()
         if not current_settings:
             return None
-
         work_dir = current_settings["WorkDir"]
-        package_json = os.path.join(work_dir, "package.json")
 
-        if not os.path.isfile(package_json):
+        staged = StagedInstall.prepare(work_dir, ref, self._package_cache_dir(work_dir))
+        if not staged:
+            return None
+        # Уже установленный набор или снимок из хранилища подставятся быстрее любого npm ci
+        if staged.dep_hash == self.npm_state.get("installed_hash") or self.node_modules_store.has(staged.dep_hash):
             return None
+        staged.start()
+        return staged
 
-        try:
-            with open(package_json, 'r', encoding='utf-8') as f:
-                data = json.load(f)
-                return data.get('scripts', {})
-        except Exception as e:
-            self.ui.show_error(f"Error reading package.json: {str(e)}")
-            return None
\ No newline at end of file
+    def finish_staged_install(self, staged: Optional[StagedInstall], old_head: Optional[str] = None):
+        """Дожидается фоновой установки и подставляет node_modules; без нее — обычная установка"""
+        if not staged:
+            self._run_npm_install(old_head=old_head)
+            return
+
+        self.ui.show_info(self.locale.tr('npm.installing'))
+        with self.ui.create_progress() as progress:
+            self.ui.track_staged_install(progress, staged)
+            returncode, output, timings = staged.wait()
+            staged.on_progress = None
+
+        if returncode != 0 or not staged.swap():
+            # Lock-файл не подошел для npm ci или дерево после checkout другое: ставим как обычно
+            staged.discard()
+            self._run_npm_install(old_head=old_head)
+            return
+
+        work_dir = staged.work_dir
+        for command in staged.lifecycle_commands():
+            returncode, output, _ = run_install(command, work_dir)
+            if returncode != 0:
+                if output:
+                    self.ui.show_error(output)
+                self.ui.show_error(self.locale.tr('npm.failed'))
+                return
+        self._record_install(work_dir, StagedInstall.NAME, time.time() - staged.started_at, timings)
+
+    def _run_install_strategy(self, strategy: Dict[str, Any], work_dir: str) -> Tuple[int, str, Dict[str, int]]:
+        """Запускает выбранную команду установки с прогресс-баром"""
+        with self.ui.create_progress() as progress:
+            task = progress.add_task(f"[cyan]{strategy['name']}", total=100)
+
+            def update(stage: str, percent: int):
+                progress.update(task, completed=percent, description=f"[cyan]{strategy['name']}: [dim]{stage}[/dim]")
+
+            result = run_install(strategy["command"], work_dir, update, strategy["env"])
+            progress.update(task, completed=100)
+        return result
+
+    def get_npm_scripts(self) -> Optional[List[Dict[str, Any]]]:
+        """npm-скрипты корня и workspaces из кешированного индекса (см. ScriptIndex)"""
+        current_settings = self.config.get_current_settings()
+        if not current_settings:
+            return None
+        return self.script_index.scripts(current_settings["WorkDir"])
\ No newline at end of file
@@ -1,10 +1,28 @@
+import atexit
 import json
 import os
 from pathlib import Path
 from typing import Dict, List, Optional, Any
+from .cache import atomic_write_json
 
 class ConfigManager:
+    # Значения по умолчанию для настроек профиля, которых может не быть в старых конфигах
+    PROFILE_OPTION_DEFAULTS = {
+        "FetchMode": "targeted",
+        "PrefetchInterval": 0,
+        "SshMultiplex": True,
+        "PartialClone": False,
+        "SparsePaths": [],
+        "WorktreePool": 0,
+        "WorktreePoolMaxMB": 0,
+        "LfsSkipSmudge": False,
+        "LfsInclude": [],
+        "NodeModulesStoreMB": 0,
+        "LocalPackageCache": False
+    }
+
     def __init__(self):
+        self._current_profile = None  # type: Optional[str]
         self.profiles = [{
             "ProfileName": "default",
             "Prefix": "dl/TTSH-",
@@ -15,11 +33,15 @@ class ConfigManager:
         self.current_profile = "default"
         self.data_dir = Path(__file__).parent.parent / 'data'
         self.settings_file = self.data_dir / 'config.json'
+        self.cache_dir = self.data_dir / 'cache'
         self.prefix_history = []
         self.dir_history = []
         self.history_file = os.path.expanduser("~/.git_manager_history")
+        self._dirty = False
 
         self._ensure_data_dir()
+        # Страховка на случай выхода мимо основного цикла: несохраненные изменения не теряются
+        atexit.register(self.flush)
 
     def _ensure_data_dir(self):
         """Создает папку data и locales, если их нет"""
@@ -30,12 +52,48 @@ class ConfigManager:
         if not locales_dir.exists():
             locales_dir.mkdir()
 
+    @property
+    def profiles(self) -> List[Dict[str, Any]]:
+        """Профили в порядке из config.json"""
+        return self._profiles
+
+    @profiles.setter
+    def profiles(self, profiles: List[Dict[str, Any]]):
+        self._profiles = profiles
+        # Индекс по имени; при повторяющихся именах, как и раньше, побеждает первый профиль
+        self._profiles_by_name = {}  # type: Dict[str, Dict[str, Any]]
+        for profile in profiles:
+            self._profiles_by_name.setdefault(profile["ProfileName"], profile)
+        self._current = self._profiles_by_name.get(self._current_profile)
+
+    @property
+    def current_profile(self) -> Optional[str]:
+        return self._current_profile
+
+    @current_profile.setter
+    def current_profile(self, name: str):
+        self._current_profile = name
+        self._current = self._profiles_by_name.get(name)
+
+    def has_profile(self, name: str) -> bool:
+        return name in self._profiles_by_name
+
     def get_current_settings(self) -> Optional[Dict[str, Any]]:
         """Возвращает настройки текущего профиля"""
-        for profile in self.profiles:
-            if profile["ProfileName"] == self.current_profile:
-                return profile
-        return None
+        return self._current
+
+    def get_option(self, key: str) -> Any:
+        """Возвращает настройку текущего профиля с учетом значения по умолчанию"""
+        default = self.PROFILE_OPTION_DEFAULTS.get(key)
+        current = self.get_current_settings()
+        return current.get(key, default) if current else default
+
+    def set_option(self, key: str, value: Any):
+        """Изменяет настройку текущего профиля"""
+        current = self.get_current_settings()
+        if current:
+            current[key] = value
+            self.save_settings()
 
     def is_first_run(self) -> bool:
         """Проверяет, первый ли это запуск (нет файла конфига)"""
@@ -45,7 +103,7 @@ class ConfigManager:
         """Загружает настройки из файла"""
         try:
             if self.settings_file.exists():
-                with open(self.settings_file, 'r') as f:
+                with open(self.settings_file, 'r', encoding='utf-8') as f:
                     data = json.load(f)
                     self.profiles = data.get('profiles', self.profiles)
                     self.current_profile = data.get('currentProfile', self.current_profile)
@@ -57,7 +115,17 @@ class ConfigManager:
             self.dir_history = [self.get_current_settings()["WorkDir"]]
 
     def save_settings(self):
-        """Сохраняет настройки в файл"""
+        """Помечает настройки измененными; на диск они попадут при flush.
+
+        Изменения копятся, пока выполняется команда, и записываются одним
+        разом, когда утилита простаивает в ожидании ввода или завершается.
+        """
+        self._dirty = True
+
+    def flush(self):
+        """Записывает измененные настройки в файл атомарно: через временный файл и rename"""
+        if not self._dirty:
+            return
         try:
             data = {
                 'profiles': self.profiles,
@@ -65,8 +133,8 @@ class ConfigManager:
                 'prefix_history': list(set(self.prefix_history))[:10],
                 'dir_history': list(set(self.dir_history))[:10]
             }
-            with open(self.settings_file, 'w') as f:
-                json.dump(data, f, indent=2)
+            atomic_write_json(self.settings_file, data, indent=2)
+            self._dirty = False
         except Exception as e:
             print(f"Error saving settings: {e}")
 
@@ -102,16 +170,18 @@ class ConfigManager:
 
     def add_profile(self, name: str, prefix: str, remote: str, work_dir: str, locale: str) -> bool:
         """Добавляет новый профиль с проверкой уникальности имени"""
-        if not name or any(p["ProfileName"] == name for p in self.profiles):
+        if not name or self.has_profile(name):
             return False
             
-        self.profiles.append({
+        profile = {
             "ProfileName": name,
             "Prefix": prefix,
             "Remote": remote,
             "WorkDir": os.path.abspath(work_dir),
             "Locale": locale
-        })
+        }
+        self.profiles.append(profile)
+        self._profiles_by_name[name] = profile
         self.current_profile = name
         self.save_settings()
         return True
@@ -128,7 +198,7 @@ class ConfigManager:
 
     def switch_profile(self, name: str):
         """Переключает текущий профиль"""
-        if any(p["ProfileName"] == name for p in self.profiles):
+        if self.has_profile(name):
             self.current_profile = name
             self.save_settings()  # Это сохранит все настройки, включая локаль
             return True
@@ -146,4 +216,6 @@ class ConfigManager:
         self.current_profile = "default"
         self.prefix_history = [prefix]
         self.dir_history = [work_dir]
-        self.save_settings()
\ No newline at end of file
+        self.save_settings()
+        # Первый профиль пишется сразу: по наличию файла определяется первый запуск
+        self.flush()
@@ -0,0 +1,70 @@
+import csv
+import json
+import os
+from typing import Any, Callable, Dict, Iterator, Optional
+
+
+class DataExporter:
+    """Экспорт истории коммитов и данных о ветках в JSONL/CSV"""
+
+    FORMATS = ("jsonl", "csv")
+    KINDS = ("log", "branches")
+
+    def __init__(self, git):
+        self.git = git
+
+    def iter_records(self, kind: str, since: Optional[str] = None, until: Optional[str] = None) -> Iterator[Dict[str, Any]]:
+        if kind == "log":
+            return self.git.iter_log_records(since=since, until=until, check=True)
+        if kind == "branches":
+            return self.git.iter_branch_records(check=True)
+        raise ValueError(f"Unknown export kind: {kind}")
+
+    def export(self, kind: str, fmt: str, output: str, since: Optional[str] = None, until: Optional[str] = None,
+               on_progress: Optional[Callable[[int], None]] = None) -> int:
+        """Пишет записи прямо из пайпа git в файл и возвращает их количество.
+
+        Записи не накапливаются в памяти, поэтому экспорт работает в
+        постоянной памяти на любой длине истории. Без активного профиля
+        поднимается ValueError, файл не создается. Если git завершился с
+        ошибкой (CalledProcessError) или запись прервалась, недописанный
+        файл удаляется, а исключение передается дальше.
+        """
+        if fmt not in self.FORMATS:
+            raise ValueError(f"Unknown export format: {fmt}")
+        # Без профиля git-команда ничего не выведет, и получился бы пустой «успешный» файл
+        if not self.git.config.get_current_settings():
+            raise ValueError(self.git.locale.tr('errors.no_active_profile'))
+
+        output_dir = os.path.dirname(os.path.abspath(output))
+        os.makedirs(output_dir, exist_ok=True)
+
+        count = 0
+        with open(output, 'w', encoding='utf-8', newline='') as f:
+            try:
+                writer = None
+                if fmt == "csv":
+                    fieldnames = self.git.LOG_FIELDS if kind == "log" else self.git.BRANCH_FIELDS
+                    writer = csv.DictWriter(f, fieldnames=fieldnames)
+                    writer.writeheader()
+
+                for record in self.iter_records(kind, since, until):
+                    if writer is None:
+                        f.write(json.dumps(record, ensure_ascii=False))
+                        f.write('\n')
+                    else:
+                        writer.writerow(record)
+
+                    count += 1
+                    if on_progress and count % 1000 == 0:
+                        on_progress(count)
+            except BaseException:
+                # Файл закрывается до удаления: в Windows открытый файл не удалить
+                f.close()
+                try:
+                    os.unlink(output)
+                except OSError:
+                    pass
+                raise
+
+        return count
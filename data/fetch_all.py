@@ -0,0 +1,126 @@
+import os
+import subprocess
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, List, Optional
+from .commands import run_git_progress
+
+
+class MultiRepoFetcher:
+    """Параллельный fetch всех remote во всех репозиториях профилей.
+
+    Каждый репозиторий — отдельное задание в ограниченном пуле потоков:
+    ошибка или зависание одного репозитория не задерживает остальные.
+    Remote одного репозитория (и его worktree) обновляются внутри задания
+    по очереди: параллельные fetch в одном .git соперничают за FETCH_HEAD,
+    packed-refs.lock и auto-gc. Изменения ссылок считаются по снимкам
+    refs/remotes/<remote> до и после fetch.
+    """
+
+    MAX_WORKERS = 4
+
+    def __init__(self, config, ssh=None):
+        self.config = config
+        self.ssh = ssh
+
+    def _git_lines(self, work_dir: str, *args: str) -> List[str]:
+        result = subprocess.run(["git"] + list(args), cwd=work_dir, capture_output=True, text=True)
+        return result.stdout.splitlines() if result.returncode == 0 else []
+
+    def targets(self) -> List[Dict[str, Any]]:
+        """Задания fetch: по одному на каждый remote каждого репозитория профилей"""
+        repos = {}
+        for profile in self.config.profiles:
+            work_dir = os.path.abspath(profile["WorkDir"])
+            repos.setdefault(work_dir, []).append(profile["ProfileName"])
+
+        targets = []
+        for work_dir, profiles in repos.items():
+            # skip — причина, по которой репозиторий не из чего обновлять (ключ локализации)
+            base = {"repo": work_dir, "git_dir": work_dir, "profiles": profiles, "remote": "", "skip": None, "error": None}
+            if not os.path.isdir(work_dir):
+                targets.append(dict(base, skip="missing_dir"))
+                continue
+            # Worktree одного репозитория делят общий .git: их fetch тоже нельзя пускать параллельно
+            git_dir = self._git_lines(work_dir, "rev-parse", "--path-format=absolute", "--git-common-dir")
+            if git_dir:
+                base["git_dir"] = git_dir[0]
+            remotes = self._git_lines(work_dir, "remote")
+            if not remotes:
+                targets.append(dict(base, skip="no_remotes"))
+            for remote in remotes:
+                targets.append(dict(base, remote=remote))
+        return targets
+
+    def _snapshot(self, work_dir: str, remote: str) -> Dict[str, str]:
+        lines = self._git_lines(work_dir, "for-each-ref", "--format=%(objectname) %(refname)", f"refs/remotes/{remote}/")
+        return {ref: oid for oid, ref in (line.split(" ", 1) for line in lines)}
+
+    def fetch_one(self, target: Dict[str, Any],
+                  on_update: Optional[Callable[[Dict[str, Any], str, int], None]] = None) -> Dict[str, Any]:
+        """Fetch одного remote; возвращает результат с изменениями ссылок или ошибкой.
+
+        on_update(target, phase, percent) вызывается при старте (пустая фаза) и на каждой строке прогресса.
+        """
+        result = dict(target, ok=False, changes=[], elapsed=0.0)
+        if target["skip"]:
+            return result
+
+        work_dir, remote = target["repo"], target["remote"]
+        if on_update:
+            on_update(target, "", 0)
+        start_time = time.time()
+        before = self._snapshot(work_dir, remote)
+
+        # Несколько параллельных запросов пароля в одном терминале смешались бы
+        env = {"GIT_TERMINAL_PROMPT": "0"}
+        if self.ssh:
+            env.update(self.ssh.git_env(work_dir, remote, batch=True))
+
+        def progress(phase: str, percent: int, size: Optional[str] = None, rate: Optional[str] = None):
+            if on_update:
+                on_update(target, phase, percent)
+
+        returncode, output = run_git_progress(["fetch", "--progress", remote], work_dir, progress, env)
+        result["elapsed"] = time.time() - start_time
+        if returncode != 0:
+            result["error"] = output.splitlines()[0] if output else f"git fetch exited with {returncode}"
+            return result
+
+        after = self._snapshot(work_dir, remote)
+        result["ok"] = True
+        result["changes"] = [
+            {"ref": ref, "old": before.get(ref), "new": after.get(ref)}
+            for ref in sorted(set(before) | set(after))
+            if before.get(ref) != after.get(ref)
+        ]
+        return result
+
+    def fetch_all(self, on_update: Optional[Callable[[Dict[str, Any], str, int], None]] = None,
+                  on_done: Optional[Callable[[Dict[str, Any]], None]] = None,
+                  workers: Optional[int] = None, targets: Optional[List[Dict[str, Any]]] = None) -> List[Dict[str, Any]]:
+        """Запускает fetch всех заданий и возвращает результаты в исходном порядке.
+
+        Параллельны только репозитории; remote одного репозитория идут по очереди.
+        """
+        targets = targets if targets is not None else self.targets()
+        repos = {}
+        for index, target in enumerate(targets):
+            repos.setdefault(target.get("git_dir") or target["repo"], []).append(index)
+
+        results = [None] * len(targets)  # type: List[Optional[Dict[str, Any]]]
+
+        def run(indexes: List[int]):
+            for index in indexes:
+                target = targets[index]
+                try:
+                    result = self.fetch_one(target, on_update)
+                except Exception as e:
+                    result = dict(target, ok=False, changes=[], elapsed=0.0, error=str(e))
+                results[index] = result
+                if on_done:
+                    on_done(result)
+
+        with ThreadPoolExecutor(max_workers=workers or self.MAX_WORKERS) as pool:
+            list(pool.map(run, repos.values()))
+        return results
@@ -0,0 +1,142 @@
+import os
+import shutil
+import threading
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, List, Optional, Tuple
+from .commands import run_git_progress
+
+
+class LfsPuller:
+    """Быстрые сбросы в репозиториях с Git LFS.
+
+    С настройкой профиля LfsSkipSmudge checkout и reset выполняются с
+    GIT_LFS_SKIP_SMUDGE=1: в рабочее дерево попадают только указатели LFS,
+    и приглашение возвращается сразу после git-части операции. Содержимое
+    затем скачивает фоновый `git lfs fetch`, ограниченный шаблонами
+    LfsInclude; его прогресс виден в приглашении ввода. Подстановку файлов
+    (`git lfs checkout`) фон выполняет только между командами пользователя:
+    она переписывает индекс и рабочее дерево, и параллельный git упал бы
+    на index.lock.
+    """
+
+    def __init__(self, config, ssh=None):
+        self.config = config
+        self.ssh = ssh
+        self._lock = threading.Lock()
+        self._thread = None  # type: Optional[threading.Thread]
+        self._pending = None  # type: Optional[Tuple[str, List[str], Dict[str, str]]]
+        self._restart = False
+        self._idle = threading.Condition()
+        self._foreground = 0
+        self._busy = False
+        self._percent = None  # type: Optional[int]
+        self._results = []  # type: List[Dict[str, Any]]
+
+    def enabled(self) -> bool:
+        return bool(self.config.get_option("LfsSkipSmudge"))
+
+    def skip_env(self) -> Dict[str, str]:
+        """Окружение для checkout/reset: без скачивания объектов LFS"""
+        return {"GIT_LFS_SKIP_SMUDGE": "1"} if self.enabled() else {}
+
+    def _uses_lfs(self, work_dir: str) -> bool:
+        try:
+            with open(os.path.join(work_dir, ".gitattributes"), 'r', encoding='utf-8', errors='replace') as f:
+                return "filter=lfs" in f.read()
+        except OSError:
+            return False
+
+    def start_pull(self) -> bool:
+        """Запускает фоновый git lfs pull; True, если он нужен и запущен (или перезапустится)"""
+        current_settings = self.config.get_current_settings()
+        if not current_settings or not self.enabled():
+            return False
+        work_dir = current_settings["WorkDir"]
+        if not self._uses_lfs(work_dir) or not shutil.which("git-lfs"):
+            return False
+
+        remote = current_settings.get("Remote", "origin")
+        args = ["lfs", "fetch", remote]
+        include = self.config.get_option("LfsInclude")
+        if include:
+            args += ["--include", ",".join(include)]
+        env = {"GIT_LFS_FORCE_PROGRESS": "1", "GIT_TERMINAL_PROMPT": "0"}
+        if self.ssh:
+            env.update(self.ssh.git_env(work_dir, remote, batch=True))
+
+        with self._lock:
+            # Перезапуск берет последнее задание: сброс мог быть в другом профиле или worktree
+            self._pending = (work_dir, args, env)
+            if self._thread and self._thread.is_alive():
+                # Идущий pull мог начаться до сброса: после него нужен еще один
+                self._restart = True
+                return True
+            self._percent = 0
+            self._thread = threading.Thread(target=self._run, name="git-lfs-pull", daemon=True)
+            self._thread.start()
+        return True
+
+    def busy(self) -> bool:
+        """Идет ли сейчас фоновая операция, которую команде пришлось бы ждать"""
+        with self._idle:
+            return self._busy
+
+    @contextmanager
+    def foreground(self):
+        """Не дает фону подставлять файлы LFS, пока выполняется команда пользователя.
+
+        Скачивание объектов продолжается; уже идущий `git lfs checkout`
+        короткий и локальный, команда его дожидается.
+        """
+        with self._idle:
+            self._foreground += 1
+            while self._busy:
+                self._idle.wait()
+        try:
+            yield
+        finally:
+            with self._idle:
+                self._foreground -= 1
+                self._idle.notify_all()
+
+    def _checkout(self, work_dir: str, progress: Callable[..., None], env: Dict[str, str]) -> Tuple[int, str]:
+        """Подставляет скачанные файлы, дождавшись, пока не выполняется команда пользователя"""
+        with self._idle:
+            while self._foreground:
+                self._idle.wait()
+            self._busy = True
+        try:
+            return run_git_progress(["lfs", "checkout"], work_dir, progress, env)
+        finally:
+            with self._idle:
+                self._busy = False
+                self._idle.notify_all()
+
+    def _run(self):
+        def progress(phase: str, percent: int, size: Optional[str] = None, rate: Optional[str] = None):
+            self._percent = percent
+
+        while True:
+            with self._lock:
+                work_dir, args, env = self._pending
+                self._restart = False
+                self._percent = 0
+            returncode, output = run_git_progress(args, work_dir, progress, env)
+            if returncode == 0:
+                returncode, output = self._checkout(work_dir, progress, env)
+            with self._lock:
+                if self._restart:
+                    continue
+                self._percent = None
+                self._results.append({"ok": returncode == 0, "error": output, "work_dir": work_dir})
+                return
+
+    def status(self) -> Optional[int]:
+        """Процент фонового pull или None, если он не идет"""
+        return self._percent
+
+    def pop_results(self) -> List[Dict[str, Any]]:
+        """Возвращает и очищает результаты завершившихся pull"""
+        with self._lock:
+            results, self._results = self._results, []
+        return results
@@ -1,11 +1,20 @@
 import os
 import re
 import subprocess
-from typing import Optional, Dict, List, Any
+from contextlib import ExitStack, contextmanager, nullcontext
+from typing import Iterator, Optional, Dict, List, Any
 from .config import ConfigManager
 from .localization import LocalizationManager  # Изменили импорт
 from .ui import UIManager
 from .commands import GitCommands
+from .prefetch import PrefetchScheduler
+from .push_queue import PushQueue
+from .ssh_mux import SshMultiplexer
+from .fetch_all import MultiRepoFetcher
+from .sparse import SparseCheckout
+from .worktrees import WorktreePool
+from .lfs import LfsPuller
+from .scripts import ScriptRunner
 from rich.table import Table
 from rich.box import ROUNDED
 
@@ -36,6 +45,17 @@ class GitBranchManager:
             self.ui.manager = self
             self.git.ui = self.ui
 
+            # Фоновые службы; общее SSH-соединение используют все git-процессы утилиты
+            self.ssh = SshMultiplexer(self.config)
+            self.git.ssh = self.ssh
+            self.prefetch = PrefetchScheduler(self.config, self.ssh)
+            self.push_queue = PushQueue(self.config, self.ssh)
+            self.fetcher = MultiRepoFetcher(self.config, self.ssh)
+            self.sparse = SparseCheckout(self.config)
+            self.worktrees = WorktreePool(self.config)
+            self.lfs = LfsPuller(self.config, self.ssh)
+            self.scripts = ScriptRunner(self.config, self.locale, self.ui.console, self.git.script_index)
+
         except Exception as e:
             print(f"Критическая ошибка инициализации: {str(e)}")
             exit(1)
@@ -43,6 +63,26 @@ class GitBranchManager:
         # Загружаем настройки
         self.config.load_settings()
 
+    # Команды, меняющие ссылки, индекс или рабочее дерево либо идущие в сеть
+    GIT_COMMANDS = {'1', '2', '3', '4', '5', '6', 'd', 'f', 'm', 's'}
+
+    @contextmanager
+    def foreground(self, command: str) -> Iterator[None]:
+        """Приостанавливает фоновые предзагрузку и подстановку LFS на время git-команды.
+
+        Остальные команды (справка, профили, меню) фон не ждут. Если фоновая
+        операция уже идет, пока она завершается, показывается строка статуса.
+        """
+        if command not in self.GIT_COMMANDS:
+            yield
+            return
+        with ExitStack() as stack:
+            waiting = self.prefetch.busy() or self.lfs.busy()
+            with self.ui.console.status(f"[cyan]{self.tr('app.waiting_background')}[/cyan]") if waiting else nullcontext():
+                stack.enter_context(self.prefetch.foreground())
+                stack.enter_context(self.lfs.foreground())
+            yield
+
     def tr(self, key: str, *args, fallback: Optional[str] = None) -> str:
         return self.locale.tr(key, *args, fallback=fallback)
 
@@ -53,11 +93,30 @@ class GitBranchManager:
         return self.git.get_current_branch()
 
     def show_prompt(self):
+        for failure in self.push_queue.pop_failures():
+            self.ui.show_error(self.tr('push.failed').format(failure["remote"], failure["branch"], failure["error"] or self.tr('errors.unknown')))
+        for result in self.lfs.pop_results():
+            if result["ok"]:
+                self.ui.show_success(self.tr('lfs.pulled').format(result["work_dir"]))
+            else:
+                self.ui.show_error(self.tr('lfs.failed').format(result["error"] or self.tr('errors.unknown')))
+        for results in self.scripts.pop_results():
+            self.ui.show_script_results(results)
+        # Утилита переходит в ожидание ввода: накопленные за команду изменения настроек пишутся одним разом
+        self.config.flush()
         print(self.ui.prompt(), end='', flush=True)
 
+    def start_lfs_pull(self):
+        """После checkout без smudge догружает объекты LFS в фоне"""
+        if self.lfs.start_pull():
+            print(f"{self.ui.color_codes['dark_gray']}{self.tr('lfs.background')}{self.ui.color_codes['reset']}")
+
     def show_branches(self):
         self.ui.show_branches()
 
+    def stop_npm_scripts(self):
+        self.ui.stop_npm_scripts()
+
     def set_branch_prefix(self):
         self.ui.set_branch_prefix()
 
@@ -76,6 +135,15 @@ class GitBranchManager:
     def show_git_actions_menu(self):
         self.ui.show_git_actions_menu()
 
+    def show_export_menu(self):
+        self.ui.show_export_menu()
+
+    def show_analytics(self):
+        self.ui.show_analytics()
+
+    def show_fetch_all(self):
+        self.ui.show_fetch_all()
+
     def show_key_bindings_help(self):
         self.ui.show_key_bindings_help()
 
@@ -149,25 +217,35 @@ class GitBranchManager:
                         return
                 continue
 
-            commands = [
-                ["git", "fetch", "origin"],
-                ["git", "checkout", default_branch],
-                ["git", "reset", "--hard", f"origin/{default_branch}"],
-                ["git", "checkout", "-b", full_branch_name],
-                ["git", "push", "-u", "origin", full_branch_name]
-            ]
+            remote = current_settings.get("Remote", "origin")
 
             print(f"\n{self.ui.color_codes['dark_gray']}{self.tr('commands.creating_branch').format(full_branch_name)}{self.ui.color_codes['reset']}")
 
-            for cmd in commands:
-                process = subprocess.run(cmd, cwd=work_dir, capture_output=True, text=True)
-                if process.returncode != 0:
-                    self.ui.show_unhappy_cat(f"🚫 {self.tr('errors.git_command_failed').format(process.stderr.strip() or self.tr('errors.unknown'))}")
-                    return
+            fetch_result = self.git.fetch_branches([default_branch])
+            if not fetch_result["ok"]:
+                return
+            self.ui.show_fetch_timing(fetch_result)
+
+            # Ветка создается прямо от свежей remote-ветки: рабочее дерево переписывается
+            # один раз, без промежуточного checkout основной ветки и reset --hard.
+            # --no-track: upstream выставит push -u, а не основная ветка
+            old_head = self.git._resolve_commit("HEAD")
+            cmd = ["git", "switch", "--no-track", "-c", full_branch_name, f"{remote}/{default_branch}"]
+            process = subprocess.run(cmd, cwd=work_dir, capture_output=True, text=True,
+                                     env=dict(os.environ, **self.lfs.skip_env()))
+            if process.returncode != 0:
+                self.ui.show_unhappy_cat(f"🚫 {self.tr('errors.git_command_failed').format(process.stderr.strip() or self.tr('errors.unknown'))}")
+                return
+            self.ui.show_update_stats(self.sparse.update_stats(old_head, self.git._resolve_commit("HEAD")))
+            self.start_lfs_pull()
+
+            # Push уходит в фоновую очередь; ошибки покажем перед следующим приглашением
+            self.push_queue.enqueue(work_dir, remote, full_branch_name)
 
             current_branch = self.git.get_current_branch()
             if current_branch == full_branch_name:
                 self.ui.show_happy_cat(self.tr("branch.created").format(full_branch_name))
+                print(f"{self.ui.color_codes['dark_gray']}{self.tr('push.queued').format(remote, full_branch_name)}{self.ui.color_codes['reset']}")
             else:
                 self.ui.show_unhappy_cat(self.tr("branch.not_switched"))
             return
@@ -227,7 +305,12 @@ class GitBranchManager:
                         remote_confirm = input(self.tr("branch.delete_remote").format(remote_branch)).strip().lower()
                         if remote_confirm == 'y':
                             # Используем Remote из текущих настроек вместо DefaultRemote
-                            self.git.run_git_command(f"push {current_settings['Remote']} --delete {remote_branch}")
+                            remote = current_settings['Remote']
+                            # upstream хранится как <remote>/<ветка>, удалять нужно саму ветку
+                            if remote_branch.startswith(f"{remote}/"):
+                                remote_branch = remote_branch[len(remote) + 1:]
+                            self.push_queue.enqueue(current_settings["WorkDir"], remote, remote_branch, delete=True)
+                            print(f"{self.ui.color_codes['dark_gray']}{self.tr('push.delete_queued').format(remote, remote_branch)}{self.ui.color_codes['reset']}")
 
                     self.ui.show_happy_cat(self.tr("branch.deleted").format(branch_to_delete))
                     return
@@ -279,24 +362,47 @@ class GitBranchManager:
 
         default_branch = self.git._get_default_branch()
         current_branch = self.git.get_current_branch()
+        remote = self.config.get_current_settings().get("Remote", "origin")
 
+        old_head = self.git._resolve_commit("HEAD")
         with self.ui.create_progress() as progress:
-            task = progress.add_task(f"[cyan]{self.locale.tr('reset.fetching')}...", total=100)
-            self.git.run_git_command("fetch")
-            progress.update(task, advance=30)
+            fetching = self.locale.tr('reset.fetching')
+            task = progress.add_task(f"[cyan]{fetching}...", total=100)
+            fetch_result = self.git.fetch_branches(
+                [default_branch],
+                on_progress=self.ui.git_progress_updater(progress, task, fetching)
+            )
+
+            # Lock-файл цели известен сразу после fetch: зависимости ставятся параллельно с checkout
+            staged = self.git.start_staged_install(f"{remote}/{default_branch}") if rebuild_locales else None
+            if staged:
+                self.ui.track_staged_install(progress, staged)
 
-            # Если текущая ветка не master/main, сначала переключаемся
+            # checkout -f -B переключает и сбрасывает ветку за один проход по рабочему дереву
+            # (вместо checkout -f + reset --hard) и, в отличие от reset, умеет --progress
             if current_branch != default_branch:
-                progress.update(task, description=f"[cyan]{self.locale.tr("branch.switching").format(default_branch)}")
-                self.git.run_git_command(f"checkout -f {default_branch}")
-                progress.update(task, advance=20)
+                resetting = self.locale.tr("branch.switching").format(default_branch)
+            else:
+                resetting = self.locale.tr('reset.resetting')
+            progress.update(task, completed=0, description=f"[cyan]{resetting}")
+            returncode, output = self.git.run_git_with_progress(
+                ["checkout", "--progress", "-f", "-B", default_branch, f"{remote}/{default_branch}"],
+                on_progress=self.ui.git_progress_updater(progress, task, resetting),
+                env=self.lfs.skip_env()
+            )
+            progress.update(task, completed=100)
 
-            progress.update(task, description=f"[cyan]{self.locale.tr('reset.resetting')}...")
-            self.git.run_git_command(f"reset --hard origin/{default_branch}")
-            progress.update(task, advance=50)
+        if returncode != 0:
+            if staged:
+                staged.discard()
+            self.ui.show_error(self.locale.tr('errors.git_command_failed').format(output or self.locale.tr('errors.unknown')))
+            return
 
+        self.ui.show_fetch_timing(fetch_result)
+        self.ui.show_update_stats(self.sparse.update_stats(old_head, self.git._resolve_commit("HEAD")))
+        self.start_lfs_pull()
         if rebuild_locales:
-            self.git._run_npm_install()
+            self.git.finish_staged_install(staged, old_head)
         self.ui.show_dragon()
 
     def reset_unstable_branch(self, confirm: bool = True):
@@ -341,24 +447,46 @@ class GitBranchManager:
         rebuild_locales = input(self.locale.tr("reset.rebuild_locales")).strip().lower() == 'y'
 
         current_branch = self.git.get_current_branch()
+        remote = self.config.get_current_settings().get("Remote", "origin")
 
+        old_head = self.git._resolve_commit("HEAD")
         with self.ui.create_progress() as progress:
-            task = progress.add_task(f"[cyan]{self.locale.tr('reset.fetching')}...", total=100)
-            self.git.run_git_command("fetch")
-            progress.update(task, advance=30)
+            fetching = self.locale.tr('reset.fetching')
+            task = progress.add_task(f"[cyan]{fetching}...", total=100)
+            fetch_result = self.git.fetch_branches(
+                ["unstable"],
+                on_progress=self.ui.git_progress_updater(progress, task, fetching)
+            )
 
-            # Если текущая ветка не unstable, сначала переключаемся
+            # Lock-файл цели известен сразу после fetch: зависимости ставятся параллельно с checkout
+            staged = self.git.start_staged_install(f"{remote}/unstable") if rebuild_locales else None
+            if staged:
+                self.ui.track_staged_install(progress, staged)
+
+            # Переключение и сброс одним checkout -f -B, с реальным прогрессом обновления файлов
             if current_branch != "unstable":
-                progress.update(task, description=f"[cyan]Переключение на unstable...")
-                self.git.run_git_command("checkout -f unstable")
-                progress.update(task, advance=20)
+                resetting = self.locale.tr("branch.switching").format("unstable")
+            else:
+                resetting = self.locale.tr('reset.resetting')
+            progress.update(task, completed=0, description=f"[cyan]{resetting}")
+            returncode, output = self.git.run_git_with_progress(
+                ["checkout", "--progress", "-f", "-B", "unstable", f"{remote}/unstable"],
+                on_progress=self.ui.git_progress_updater(progress, task, resetting),
+                env=self.lfs.skip_env()
+            )
+            progress.update(task, completed=100)
 
-            progress.update(task, description=f"[cyan]{self.locale.tr('reset.resetting')}...")
-            self.git.run_git_command("reset --hard origin/unstable")
-            progress.update(task, advance=50)
+        if returncode != 0:
+            if staged:
+                staged.discard()
+            self.ui.show_error(self.locale.tr('errors.git_command_failed').format(output or self.locale.tr('errors.unknown')))
+            return
 
+        self.ui.show_fetch_timing(fetch_result)
+        self.ui.show_update_stats(self.sparse.update_stats(old_head, self.git._resolve_commit("HEAD")))
+        self.start_lfs_pull()
         if rebuild_locales:
-            self.git._run_npm_install()
+            self.git.finish_staged_install(staged, old_head)
         self.ui.show_phoenix()
 
     def soft_reset_to_master(self, confirm: bool = True):
@@ -435,6 +563,7 @@ class GitBranchManager:
             {"key": "s", "description": self.tr("profiles.switch"), "action": self._switch_profile},
             {"key": "a", "description": self.tr("profiles.add"), "action": self._add_profile},
             {"key": "d", "description": self.tr("profiles.delete"), "action": self._delete_profile},
+            {"key": "o", "description": self.tr("profiles.options"), "action": self._edit_profile_options},
             {"key": "q", "description": self.tr("menu.exit"), "action": lambda: None}
         ]
 
@@ -454,6 +583,79 @@ class GitBranchManager:
             else:
                 self.ui.show_error(self.tr('errors.invalid_choice'))
 
+    # Редактируемые настройки профиля: тип определяет способ ввода значения
+    PROFILE_OPTIONS = [
+        {"key": "FetchMode", "type": "choice", "choices": ["targeted", "full"]},
+        {"key": "PrefetchInterval", "type": "int"},
+        {"key": "SshMultiplex", "type": "bool"},
+        {"key": "PartialClone", "type": "bool"},
+        {"key": "SparsePaths", "type": "list"},
+        {"key": "WorktreePool", "type": "int"},
+        {"key": "WorktreePoolMaxMB", "type": "int"},
+        {"key": "LfsSkipSmudge", "type": "bool"},
+        {"key": "LfsInclude", "type": "list"},
+        {"key": "NodeModulesStoreMB", "type": "int"},
+        {"key": "LocalPackageCache", "type": "bool"}
+    ]
+
+    def _edit_profile_options(self):
+        """Показывает и изменяет дополнительные настройки текущего профиля"""
+        table = Table(
+            title=self.tr("options.title").format(self.config.current_profile),
+            box=ROUNDED,
+            header_style="bold cyan"
+        )
+        table.add_column("#", style="green", width=5)
+        table.add_column(self.tr("options.name"), style="white", min_width=30)
+        table.add_column(self.tr("options.value"), style="cyan", min_width=15)
+
+        for idx, option in enumerate(self.PROFILE_OPTIONS, 1):
+            value = self.config.get_option(option["key"])
+            if option["type"] == "list":
+                value = ", ".join(value) or "-"
+            table.add_row(str(idx), self.tr(f"options.{option['key']}"), str(value))
+
+        self.ui.console.print()
+        self.ui.console.print(table)
+        self.ui.console.print()
+
+        choice = input(self.tr("options.select").format(len(self.PROFILE_OPTIONS))).strip().lower()
+        if choice == 'q':
+            return
+        if not choice.isdigit() or not 1 <= int(choice) <= len(self.PROFILE_OPTIONS):
+            self.ui.show_error(self.tr('errors.invalid_choice'))
+            return
+
+        option = self.PROFILE_OPTIONS[int(choice) - 1]
+        key = option["key"]
+        current = self.config.get_option(key)
+
+        if option["type"] == "bool":
+            value = not current
+        elif option["type"] == "choice":
+            choices = option["choices"]
+            value = choices[(choices.index(current) + 1) % len(choices)] if current in choices else choices[0]
+        elif option["type"] == "int":
+            raw = input(self.tr("options.enter_value").format(current)).strip()
+            if not raw:
+                return
+            if not raw.isdigit():
+                self.ui.show_error(self.tr('errors.invalid_choice'))
+                return
+            value = int(raw)
+        else:
+            raw = input(self.tr("options.enter_list").format(", ".join(current))).strip()
+            value = [item.strip() for item in raw.split(",") if item.strip()]
+
+        self.config.set_option(key, value)
+        if key in ("PartialClone", "SparsePaths"):
+            error = self.sparse.apply()
+            if error:
+                self.ui.show_error(self.tr('errors.git_command_failed').format(error))
+        if option["type"] == "list":
+            value = ", ".join(value) or "-"
+        self.ui.show_success(self.tr("options.changed").format(self.tr(f"options.{key}"), value))
+
     def _switch_profile(self):
         """Переключает профиль с обновлением локализации"""
         profiles = self.config.profiles
@@ -484,7 +686,7 @@ class GitBranchManager:
                 self.ui.show_error(self.locale.tr('profiles.name_empty'))
                 return
 
-            if any(p["ProfileName"] == name for p in self.config.profiles):
+            if self.config.has_profile(name):
                 self.ui.show_error(self.locale.tr('profiles.name_exists'))
                 return
 
@@ -0,0 +1,645 @@
+import asyncio
+import glob
+import hashlib
+import json
+import os
+import re
+import shutil
+import subprocess
+import sys
+import threading
+import time
+from collections import deque
+from typing import Any, Callable, Dict, List, Optional, Tuple
+from .cache import atomic_write_json, directory_size
+
+# Файлы, от которых зависит содержимое node_modules
+DEPENDENCY_FILES = ("package.json", "package-lock.json", "npm-shrinkwrap.json", "pnpm-lock.yaml", "yarn.lock")
+
+# Lock-файл -> менеджер пакетов, в порядке приоритета
+LOCKFILES = (
+    ("pnpm-lock.yaml", "pnpm"),
+    ("yarn.lock", "yarn"),
+    ("npm-shrinkwrap.json", "npm"),
+    ("package-lock.json", "npm"),
+)
+
+# Строка, которую npm печатает с --timing: "npm timing reify:unpack Completed in 19ms"
+NPM_TIMING_PATTERN = re.compile(r'^npm timing (?P<name>\S+) Completed in (?P<ms>\d+)ms')
+
+# Доля прогресса к завершению этапа npm; распаковка пакетов заполняет промежуток 20-85%
+NPM_MILESTONES = {
+    "npm:load": 5,
+    "idealTree": 15,
+    "reify:loadTrees": 18,
+    "reify:diffTrees": 20,
+    "reify:unpack": 85,
+    "reify:build": 92,
+    "reify:save": 97,
+    "reify": 99,
+}
+
+
+# Поля package.json, изменение которых в корне меняет все дерево зависимостей
+DEPENDENCY_FIELDS = ("dependencies", "devDependencies", "optionalDependencies", "peerDependencies",
+                     "overrides", "resolutions", "workspaces")
+
+
+def read_package_json(work_dir: str) -> Dict[str, Any]:
+    """Содержимое package.json; OSError/ValueError, если его нет или он поврежден"""
+    with open(os.path.join(work_dir, "package.json"), 'r', encoding='utf-8') as f:
+        data = json.load(f)
+    if not isinstance(data, dict):
+        raise ValueError("package.json is not an object")
+    return data
+
+
+def workspace_patterns(package: Dict[str, Any]) -> List[str]:
+    workspaces = package.get("workspaces") or []
+    if isinstance(workspaces, dict):
+        # Формат yarn: {"packages": [...], "nohoist": [...]}
+        workspaces = workspaces.get("packages") or []
+    return [pattern for pattern in workspaces if isinstance(pattern, str)]
+
+
+def workspace_dirs(work_dir: str) -> List[str]:
+    """Относительные пути workspaces из корневого package.json"""
+    try:
+        patterns = workspace_patterns(read_package_json(work_dir))
+    except (OSError, ValueError):
+        return []
+    return expand_workspaces(work_dir, patterns)
+
+
+def expand_workspaces(work_dir: str, patterns: List[str]) -> List[str]:
+    """Каталоги с package.json, подходящие под шаблоны workspaces"""
+    dirs = set()
+    for pattern in patterns:
+        for path in glob.glob(os.path.join(work_dir, pattern, "package.json")):
+            if "node_modules" not in os.path.relpath(path, work_dir).split(os.sep):
+                dirs.add(os.path.relpath(os.path.dirname(path), work_dir).replace(os.sep, "/"))
+    return sorted(dirs)
+
+
+def dependency_hash(work_dir: str) -> Optional[str]:
+    """Хеш package.json, lock-файла и package.json всех workspaces; None, если package.json нет"""
+    contents = {}
+    names = list(DEPENDENCY_FILES) + [f"{workspace}/package.json" for workspace in workspace_dirs(work_dir)]
+    for name in names:
+        try:
+            with open(os.path.join(work_dir, name), 'rb') as f:
+                contents[name] = f.read()
+        except OSError:
+            continue
+    return _contents_hash(contents)
+
+
+def _contents_hash(contents: Dict[str, bytes]) -> Optional[str]:
+    """Хеш файлов зависимостей в порядке DEPENDENCY_FILES, затем workspaces"""
+    if "package.json" not in contents:
+        return None
+    digest = hashlib.sha256()
+    for name, content in contents.items():
+        digest.update(name.encode('utf-8') + b'\0' + content + b'\0')
+    return digest.hexdigest()
+
+
+def _git_json(work_dir: str, ref: str, path: str) -> Optional[Dict[str, Any]]:
+    """JSON-файл из коммита; None, если его там нет или он не разбирается"""
+    result = subprocess.run(["git", "show", f"{ref}:{path}"], cwd=work_dir, capture_output=True)
+    if result.returncode != 0:
+        return None
+    try:
+        data = json.loads(result.stdout.decode('utf-8'))
+    except ValueError:
+        return None
+    return data if isinstance(data, dict) else None
+
+
+def changed_workspaces(work_dir: str, old: str, new: str) -> Optional[List[str]]:
+    """Workspaces, чьи package.json изменились между коммитами old и new.
+
+    None означает, что нужна полная установка: изменились зависимости
+    корневого package.json, состав workspaces или структура lock-файла
+    (версия формата, корневая запись, набор ссылок на workspaces, удаленные
+    пакеты), либо lock-файл изменился без изменений в package.json
+    какого-либо workspace.
+    """
+    diff = subprocess.run(["git", "diff", "--name-only", "--no-renames", old, new],
+                          cwd=work_dir, capture_output=True, text=True)
+    if diff.returncode != 0:
+        return None
+    changed = set(diff.stdout.splitlines())
+
+    old_package, new_package = _git_json(work_dir, old, "package.json"), _git_json(work_dir, new, "package.json")
+    if old_package is None or new_package is None:
+        return None
+    if any(old_package.get(field) != new_package.get(field) for field in DEPENDENCY_FIELDS):
+        return None
+
+    workspaces = [w for w in workspace_dirs(work_dir) if f"{w}/package.json" in changed]
+
+    lockfile = "package-lock.json"
+    if lockfile in changed:
+        old_lock, new_lock = _git_json(work_dir, old, lockfile), _git_json(work_dir, new, lockfile)
+        if old_lock is None or new_lock is None or not workspaces:
+            return None
+        if old_lock.get("lockfileVersion") != new_lock.get("lockfileVersion"):
+            return None
+        old_packages, new_packages = old_lock.get("packages", {}), new_lock.get("packages", {})
+        if old_packages.get("") != new_packages.get(""):
+            return None
+        # Установка отдельных workspaces не удаляет лишние пакеты: удаление требует полной установки
+        if set(old_packages) - set(new_packages):
+            return None
+
+        def links(packages: Dict[str, Any]) -> Dict[str, Any]:
+            return {path: info.get("resolved") for path, info in packages.items() if isinstance(info, dict) and info.get("link")}
+
+        if links(old_packages) != links(new_packages):
+            return None
+    return workspaces
+
+
+def node_modules_intact(work_dir: str) -> bool:
+    """Быстрая проверка node_modules без запуска npm.
+
+    npm 7+ пишет node_modules/.package-lock.json со списком установленных
+    пакетов: достаточно убедиться, что каталог каждого из них на месте.
+    Без этого файла проверяем только, что node_modules не пуст.
+    """
+    node_modules = os.path.join(work_dir, "node_modules")
+    if not os.path.isdir(node_modules):
+        return False
+
+    try:
+        with open(os.path.join(node_modules, ".package-lock.json"), 'r', encoding='utf-8') as f:
+            hidden_lock = json.load(f)
+    except (OSError, ValueError):
+        try:
+            return any(True for _ in os.scandir(node_modules))
+        except OSError:
+            return False
+
+    for path, info in hidden_lock.get("packages", {}).items():
+        # Ссылки на workspaces указывают за пределы node_modules, их каталоги не проверяем
+        if not path or (isinstance(info, dict) and info.get("link")):
+            continue
+        if not os.path.isdir(os.path.join(work_dir, path)):
+            return False
+    return True
+
+
+def _lock_package_count(work_dir: str) -> int:
+    """Число пакетов в lock-файле: знаменатель прогресса распаковки"""
+    for name in ("npm-shrinkwrap.json", "package-lock.json"):
+        try:
+            with open(os.path.join(work_dir, name), 'r', encoding='utf-8') as f:
+                packages = json.load(f).get("packages", {})
+        except (OSError, ValueError, AttributeError):
+            continue
+        return sum(1 for path in packages if path.startswith("node_modules/") or "/node_modules/" in path)
+    return 0
+
+
+async def _run_install_async(command: List[str], cwd: str, on_line: Callable[[str], None],
+                             env: Optional[Dict[str, str]]) -> int:
+    process = await asyncio.create_subprocess_exec(
+        *command,
+        cwd=cwd,
+        stdin=asyncio.subprocess.DEVNULL,
+        stdout=asyncio.subprocess.PIPE,
+        stderr=asyncio.subprocess.PIPE,
+        env=dict(os.environ, **env) if env else None
+    )
+
+    async def drain(stream: asyncio.StreamReader):
+        # Читаем кусками, а не readline: длинная строка без \n не должна упираться в лимит буфера
+        pending = b""
+        while True:
+            chunk = await stream.read(4096)
+            if not chunk:
+                break
+            *lines, pending = re.split(rb'[\r\n]', pending + chunk)
+            for line in lines:
+                on_line(line.decode('utf-8', errors='replace'))
+        on_line(pending.decode('utf-8', errors='replace'))
+
+    await asyncio.gather(drain(process.stdout), drain(process.stderr))
+    return await process.wait()
+
+
+def run_install(command: List[str], cwd: str, on_progress: Optional[Callable[[str, int], None]] = None,
+                env: Optional[Dict[str, str]] = None) -> Tuple[int, str, Dict[str, int]]:
+    """Запускает команду установки зависимостей и разбирает stdout и stderr по мере поступления.
+
+    Оба потока вычитываются одновременно, поэтому многословная установка
+    не блокируется на заполненном канале. Строки npm --timing переводятся
+    в on_progress(stage, percent), где доля распаковки считается по числу
+    пакетов в lock-файле. Остальной вывод копится в ограниченный хвост для
+    ошибок. Возвращает код возврата, хвост и длительности этапов в мс.
+    """
+    total_packages = _lock_package_count(cwd)
+    tail = deque(maxlen=40)
+    timings = {}  # type: Dict[str, int]
+    state = {"percent": 0, "unpacked": 0}
+
+    def on_line(line: str):
+        line = line.strip()
+        if not line:
+            return
+        match = NPM_TIMING_PATTERN.match(line)
+        if not match:
+            tail.append(line)
+            return
+
+        name, ms = match.group("name"), int(match.group("ms"))
+        timings[name] = ms
+        percent = NPM_MILESTONES.get(name)
+        if name.startswith("reifyNode:"):
+            state["unpacked"] += 1
+            if total_packages:
+                percent = 20 + 65 * min(state["unpacked"], total_packages) // total_packages
+        if percent is not None and percent > state["percent"]:
+            state["percent"] = percent
+        if on_progress:
+            on_progress(name, state["percent"])
+
+    try:
+        returncode = asyncio.run(_run_install_async(command, cwd, on_line, env))
+    except OSError as e:
+        return 1, str(e), timings
+    return returncode, "\n".join(tail), timings
+
+
+def detect_package_manager(work_dir: str) -> Tuple[str, bool]:
+    """Менеджер пакетов проекта и наличие его lock-файла.
+
+    Поле packageManager из package.json (corepack) важнее lock-файлов.
+    """
+    declared = None
+    try:
+        with open(os.path.join(work_dir, "package.json"), 'r', encoding='utf-8') as f:
+            field = json.load(f).get("packageManager")
+        if isinstance(field, str):
+            declared = field.split("@", 1)[0]
+    except (OSError, ValueError, AttributeError):
+        pass
+
+    for lockfile, manager in LOCKFILES:
+        if (declared is None or declared == manager) and os.path.isfile(os.path.join(work_dir, lockfile)):
+            return manager, True
+    return declared if declared in ("npm", "pnpm", "yarn") else "npm", False
+
+
+def _executable(manager: str) -> Optional[List[str]]:
+    """Команда запуска менеджера: сам менеджер или corepack, если его нет в PATH"""
+    suffix = ".cmd" if os.name == 'nt' else ""
+    if shutil.which(manager + suffix):
+        return [manager + suffix]
+    if manager != "npm" and shutil.which("corepack" + suffix):
+        return ["corepack" + suffix, manager]
+    return None
+
+
+def install_strategy(work_dir: str, cache_dir: Optional[str] = None, clean: Optional[bool] = None,
+                     workspaces: Optional[List[str]] = None) -> Optional[Dict[str, Any]]:
+    """Самая быстрая корректная команда установки для проекта.
+
+    Возвращает {"name", "manager", "command", "env"} или None, если менеджер
+    не установлен. С lock-файлом установка идет строго по нему; npm ci
+    выбирается для установки с нуля (он удаляет node_modules, поэтому при
+    существующем каталоге быстрее npm install). clean переопределяет это
+    решение. cache_dir — локальный кеш пакетов вместо кеша менеджера.
+    workspaces ограничивают установку npm указанными workspaces.
+    """
+    manager, has_lockfile = detect_package_manager(work_dir)
+    executable = _executable(manager)
+    if not executable:
+        return None
+
+    env = {}  # type: Dict[str, str]
+    if manager == "npm":
+        if workspaces:
+            clean = False
+        elif clean is None:
+            clean = not os.path.isdir(os.path.join(work_dir, "node_modules"))
+        args = ["ci" if has_lockfile and clean else "install", "--prefer-offline", "--no-audit", "--no-fund", "--progress=false"]
+        if cache_dir:
+            args += ["--cache", cache_dir]
+        # --timing и конкретные workspaces в имя стратегии не входят: по нему копится статистика
+        name = " ".join(["npm"] + args[:2] + (["--workspace"] if workspaces else []))
+        args += [f"--workspace={workspace}" for workspace in workspaces or []]
+        return {"name": name, "manager": manager, "command": executable + args + ["--timing"], "env": env}
+
+    if manager == "pnpm":
+        args = ["install", "--prefer-offline"] + (["--frozen-lockfile"] if has_lockfile else [])
+        if cache_dir:
+            args += ["--store-dir", cache_dir]
+    elif os.path.isfile(os.path.join(work_dir, ".yarnrc.yml")):
+        # Yarn 2+ (berry): --frozen-lockfile и --prefer-offline там не поддерживаются
+        args = ["install"] + (["--immutable"] if has_lockfile else [])
+    else:
+        args = ["install", "--prefer-offline", "--non-interactive"] + (["--frozen-lockfile"] if has_lockfile else [])
+    if manager == "yarn" and cache_dir:
+        env["YARN_CACHE_FOLDER"] = cache_dir
+    return {"name": " ".join([manager] + args[:3]), "manager": manager, "command": executable + args, "env": env}
+
+
+def replace_node_modules(work_dir: str, source: str):
+    """Ставит каталог source (на той же файловой системе) на место node_modules"""
+    node_modules = os.path.join(work_dir, "node_modules")
+    # Старый каталог сначала переименовывается, чтобы node_modules не пропадал надолго
+    retired = None
+    if os.path.lexists(node_modules):
+        retired = f"{node_modules}.old-{os.getpid()}"
+        shutil.rmtree(retired, ignore_errors=True)
+        os.rename(node_modules, retired)
+    os.rename(source, node_modules)
+    if retired:
+        threading.Thread(target=shutil.rmtree, args=(retired, True), daemon=True).start()
+
+
+def clone_tree(src: str, dst: str):
+    """Быстрая копия дерева: reflink (copy-on-write), иначе обычная копия.
+
+    Жесткие ссылки не годятся: postinstall, patch-package и кеши в
+    node_modules/.cache пишут файлы на месте и испортили бы снимок.
+    """
+    if os.name != 'nt' and shutil.which("cp"):
+        flag = "-c" if sys.platform == "darwin" else "--reflink=always"
+        result = subprocess.run(["cp", "-R", "-P", "-p", flag, src, dst], capture_output=True)
+        if result.returncode == 0:
+            return
+        shutil.rmtree(dst, ignore_errors=True)
+    shutil.copytree(src, dst, symlinks=True)
+
+
+class NodeModulesStore:
+    """Хранилище снимков node_modules по хешу зависимостей.
+
+    После успешного npm install каталог node_modules сохраняется в кеш
+    под хешем package.json, lock-файла и версии Node. Когда рабочее дерево
+    возвращается к уже встречавшемуся набору зависимостей (переключение
+    веток, сброс), node_modules восстанавливается из снимка за доли
+    секунды вместо повторной установки. Копирование идет через reflink, где
+    файловая система его поддерживает, иначе обычным копированием: файлы
+    снимка и рабочего дерева никогда не общие, и правки в node_modules
+    снимок не затрагивают.
+    Общий размер снимков ограничен NodeModulesStoreMB, при превышении
+    удаляются давно не использованные.
+    """
+
+    def __init__(self, config):
+        self.config = config
+        self.root = config.cache_dir / "node_modules"
+        self._lock = threading.Lock()
+        self._node_version = None  # type: Optional[str]
+
+    def _max_bytes(self) -> int:
+        try:
+            return max(0, int(self.config.get_option("NodeModulesStoreMB") or 0)) * 1024 * 1024
+        except (TypeError, ValueError):
+            return 0
+
+    def enabled(self) -> bool:
+        return self._max_bytes() > 0
+
+    def _key(self, dep_hash: str) -> str:
+        # Нативные модули собираются под конкретную версию Node: она часть ключа
+        if self._node_version is None:
+            node_cmd = "node.exe" if os.name == 'nt' else "node"
+            try:
+                result = subprocess.run([node_cmd, "--version"], capture_output=True, text=True)
+                self._node_version = result.stdout.strip()
+            except OSError:
+                self._node_version = ""
+        return hashlib.sha256(f"{dep_hash}\0{self._node_version}".encode('utf-8')).hexdigest()[:32]
+
+    def _load(self) -> Dict[str, Dict[str, Any]]:
+        try:
+            with open(self.root / "index.json", 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def _save(self, entries: Dict[str, Dict[str, Any]]):
+        try:
+            atomic_write_json(self.root / "index.json", entries)
+        except OSError as e:
+            print(f"Error saving node_modules store index: {e}")
+
+    def restore(self, work_dir: str, dep_hash: Optional[str]) -> bool:
+        """Подменяет node_modules снимком для dep_hash; True, если снимок нашелся"""
+        if not dep_hash or not self.enabled():
+            return False
+        key = self._key(dep_hash)
+        snapshot = self.root / key
+        with self._lock:
+            entries = self._load()
+            if key not in entries or not snapshot.is_dir():
+                return False
+
+            node_modules = os.path.join(work_dir, "node_modules")
+            staging = f"{node_modules}.restore-{os.getpid()}"
+            shutil.rmtree(staging, ignore_errors=True)
+            try:
+                clone_tree(str(snapshot), staging)
+            except OSError:
+                shutil.rmtree(staging, ignore_errors=True)
+                return False
+
+            replace_node_modules(work_dir, staging)
+            entries[key]["last_used"] = time.time()
+            self._save(entries)
+        return True
+
+    def has(self, dep_hash: Optional[str]) -> bool:
+        if not dep_hash or not self.enabled():
+            return False
+        key = self._key(dep_hash)
+        with self._lock:
+            return key in self._load() and (self.root / key).is_dir()
+
+    def save(self, work_dir: str, dep_hash: Optional[str]):
+        """Сохраняет снимок node_modules, если для dep_hash его еще нет"""
+        node_modules = os.path.join(work_dir, "node_modules")
+        if not dep_hash or not self.enabled() or not os.path.isdir(node_modules):
+            return
+        key = self._key(dep_hash)
+        with self._lock:
+            entries = self._load()
+            if key in entries and (self.root / key).is_dir():
+                entries[key]["last_used"] = time.time()
+                self._save(entries)
+                return
+
+            staging = self.root / f".{key}.tmp"
+            shutil.rmtree(staging, ignore_errors=True)
+            self.root.mkdir(parents=True, exist_ok=True)
+            try:
+                clone_tree(node_modules, str(staging))
+                shutil.rmtree(self.root / key, ignore_errors=True)
+                os.rename(staging, self.root / key)
+            except OSError as e:
+                shutil.rmtree(staging, ignore_errors=True)
+                print(f"Error saving node_modules snapshot: {e}")
+                return
+
+            entries[key] = {"size": directory_size(str(self.root / key)), "last_used": time.time()}
+            self._evict(entries, keep=key)
+            self._save(entries)
+
+    def _evict(self, entries: Dict[str, Dict[str, Any]], keep: str):
+        """Удаляет давно не использованные снимки сверх лимита; вызывается под блокировкой"""
+        max_bytes = self._max_bytes()
+        total = sum(entry.get("size", 0) for entry in entries.values())
+        for key, entry in sorted(entries.items(), key=lambda item: item[1].get("last_used", 0)):
+            if total <= max_bytes:
+                break
+            if key == keep:
+                continue
+            shutil.rmtree(self.root / key, ignore_errors=True)
+            total -= entry.get("size", 0)
+            del entries[key]
+
+
+# Скрипты корневого пакета, которые npm ci выполняет после установки зависимостей
+ROOT_LIFECYCLE_SCRIPTS = ("preinstall", "install", "postinstall", "prepare")
+
+
+class StagedInstall:
+    """npm ci для целевого коммита в отдельном каталоге, параллельно с checkout.
+
+    package.json и lock-файл берутся прямо из коммита (`git show`), поэтому
+    разрешение и скачивание зависимостей начинаются сразу после fetch.
+    Установка идет с --ignore-scripts в каталог внутри .git: он на той же
+    файловой системе, что и рабочее дерево, и не виден git status. После
+    checkout готовый node_modules подменяет старый переименованием, затем
+    выполняются пропущенные скрипты установки.
+    """
+
+    NAME = "npm ci --ignore-scripts (staged)"
+
+    def __init__(self, work_dir: str, staging_dir: str, contents: Dict[str, bytes], cache_dir: Optional[str] = None):
+        self.work_dir = work_dir
+        self.staging_dir = staging_dir
+        self.contents = contents
+        self.dep_hash = _contents_hash({name: content for name, content in contents.items() if name in DEPENDENCY_FILES})
+        self.cache_dir = cache_dir
+        self.on_progress = None  # type: Optional[Callable[[str, int], None]]
+        self.result = None  # type: Optional[Tuple[int, str, Dict[str, int]]]
+        self._thread = None  # type: Optional[threading.Thread]
+        self.started_at = 0.0
+
+    @classmethod
+    def prepare(cls, work_dir: str, ref: str, cache_dir: Optional[str] = None) -> Optional["StagedInstall"]:
+        """Готовит установку для ref; None, если проект в ref не ставится через npm ci"""
+        git_dir = subprocess.run(["git", "rev-parse", "--absolute-git-dir"], cwd=work_dir, capture_output=True, text=True)
+        if git_dir.returncode != 0 or not _executable("npm"):
+            return None
+
+        # Один cat-file на все файлы: "<oid> blob <size>\n<содержимое>\n" или "<имя> missing\n"
+        names = DEPENDENCY_FILES + (".npmrc",)
+        request = "".join(f"{ref}:{name}\n" for name in names).encode('utf-8')
+        batch = subprocess.run(["git", "cat-file", "--batch"], cwd=work_dir, input=request, capture_output=True)
+        if batch.returncode != 0:
+            return None
+        contents = {}
+        output, position = batch.stdout, 0
+        for name in names:
+            header_end = output.index(b"\n", position)
+            header = output[position:header_end].split()
+            position = header_end + 1
+            if header[-1] == b"missing":
+                continue
+            size = int(header[2])
+            contents[name] = output[position:position + size]
+            position += size + 1
+
+        # Только npm с lock-файлом и без workspaces: им нужен лишь корневой package.json
+        if "package.json" not in contents or not ({"package-lock.json", "npm-shrinkwrap.json"} & set(contents)):
+            return None
+        if {"pnpm-lock.yaml", "yarn.lock"} & set(contents):
+            return None
+        try:
+            package = json.loads(contents["package.json"].decode('utf-8'))
+            lock = json.loads((contents.get("npm-shrinkwrap.json") or contents["package-lock.json"]).decode('utf-8'))
+        except ValueError:
+            return None
+        if not isinstance(package, dict) or workspace_patterns(package) or package.get("packageManager", "npm").split("@", 1)[0] != "npm":
+            return None
+        # Локальные зависимости (file:, link:) задаются путями от корня проекта и в другом каталоге не разрешатся
+        for path, info in lock.get("packages", {}).items():
+            if path and isinstance(info, dict) and (info.get("link") or str(info.get("resolved", "")).startswith("file:")):
+                return None
+        # lockfileVersion 1: версия локальной зависимости записана как "file:..."
+        for info in lock.get("dependencies", {}).values():
+            if isinstance(info, dict) and str(info.get("version", "")).startswith("file:"):
+                return None
+
+        staging_dir = os.path.join(git_dir.stdout.strip(), "npm-staging")
+        return cls(work_dir, staging_dir, contents, cache_dir)
+
+    def start(self):
+        self.started_at = time.time()
+        shutil.rmtree(self.staging_dir, ignore_errors=True)
+        os.makedirs(self.staging_dir)
+        for name, content in self.contents.items():
+            with open(os.path.join(self.staging_dir, name), 'wb') as f:
+                f.write(content)
+        self._thread = threading.Thread(target=self._run, name="npm-staged-install", daemon=True)
+        self._thread.start()
+
+    def _run(self):
+        command = _executable("npm") + ["ci", "--ignore-scripts", "--prefer-offline", "--no-audit", "--no-fund", "--progress=false", "--timing"]
+        if self.cache_dir:
+            command += ["--cache", self.cache_dir]
+
+        def progress(stage: str, percent: int):
+            if self.on_progress:
+                self.on_progress(stage, percent)
+
+        try:
+            self.result = run_install(command, self.staging_dir, progress)
+        except Exception as e:
+            self.result = (1, str(e), {})
+
+    def wait(self) -> Tuple[int, str, Dict[str, int]]:
+        self._thread.join()
+        return self.result
+
+    def swap(self) -> bool:
+        """Подменяет node_modules результатом; False, если рабочее дерево не совпало с ref"""
+        staged = os.path.join(self.staging_dir, "node_modules")
+        if dependency_hash(self.work_dir) != self.dep_hash or not os.path.isdir(staged):
+            return False
+        try:
+            replace_node_modules(self.work_dir, staged)
+        except OSError:
+            return False
+        shutil.rmtree(self.staging_dir, ignore_errors=True)
+        return True
+
+    def lifecycle_commands(self) -> List[List[str]]:
+        """Команды для скриптов установки, пропущенных из-за --ignore-scripts"""
+        npm = _executable("npm")
+        commands = []
+        # Разбор уже проверен в prepare
+        lock = json.loads(self.contents.get("npm-shrinkwrap.json") or self.contents["package-lock.json"])
+        if any(isinstance(info, dict) and info.get("hasInstallScript") for path, info in lock.get("packages", {}).items() if path):
+            commands.append(npm + ["rebuild", "--timing"])
+        scripts = json.loads(self.contents["package.json"]).get("scripts") or {}
+        for script in ROOT_LIFECYCLE_SCRIPTS:
+            if script in scripts:
+                commands.append(npm + ["run", script])
+        return commands
+
+    def discard(self):
+        """Отказ от результата: каталог удаляется, когда установка завершится"""
+        def cleanup():
+            if self._thread:
+                self._thread.join()
+            shutil.rmtree(self.staging_dir, ignore_errors=True)
+        self.on_progress = None
+        threading.Thread(target=cleanup, daemon=True).start()
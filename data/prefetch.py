@@ -0,0 +1,160 @@
+import os
+import subprocess
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Dict, List, Optional
+from .commands import resolve_default_branch
+
+
+class PrefetchScheduler:
+    """Фоновая предзагрузка основной ветки и unstable для активного профиля.
+
+    Объекты скачиваются через `git fetch --prefetch`, который пишет ссылки в
+    refs/prefetch/ и не двигает remote-ветки пользователя. Последующий
+    fetch при сбросе или создании ветки находит объекты уже на диске и
+    сводится к обмену ссылками.
+    """
+
+    # Кроме основной ветки профиля свежей держим unstable: ее сбрасывают командой 2
+    UNSTABLE_BRANCH = "unstable"
+    # Потолок экспоненциальной задержки после ошибок (секунды)
+    MAX_BACKOFF = 3600
+
+    def __init__(self, config, ssh=None):
+        self.config = config
+        self.ssh = ssh
+        self._stop = threading.Event()
+        self._wakeup = threading.Event()
+        self._idle = threading.Condition()
+        self._foreground = 0
+        self._busy = False
+        self._failures = 0
+        self._thread = None  # type: Optional[threading.Thread]
+        self.last_success = None  # type: Optional[float]
+        self.last_error = None  # type: Optional[str]
+
+    def start(self):
+        if self._thread and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="git-prefetch", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._wakeup.set()
+        with self._idle:
+            self._idle.notify_all()
+
+    def busy(self) -> bool:
+        """Идет ли сейчас фоновая операция, которую команде пришлось бы ждать"""
+        with self._idle:
+            return self._busy
+
+    @contextmanager
+    def foreground(self):
+        """Приостанавливает предзагрузку, пока выполняется команда пользователя.
+
+        Уже идущий фоновый fetch дожидается завершения: иначе команда
+        пользователя столкнулась бы с ним на блокировках ссылок.
+        """
+        with self._idle:
+            self._foreground += 1
+            while self._busy:
+                self._idle.wait()
+        try:
+            yield
+        finally:
+            with self._idle:
+                self._foreground -= 1
+                self._idle.notify_all()
+
+    def _interval(self) -> int:
+        """Интервал из настроек профиля в секундах; 0 отключает предзагрузку"""
+        try:
+            return max(0, int(self.config.get_option("PrefetchInterval"))) * 60
+        except (TypeError, ValueError):
+            return 0
+
+    def _next_delay(self) -> int:
+        interval = self._interval()
+        if not interval:
+            return 60  # Проверяем раз в минуту, не включили ли предзагрузку
+        return min(interval * (2 ** self._failures), max(interval, self.MAX_BACKOFF))
+
+    def _run(self):
+        while not self._stop.is_set():
+            self._wakeup.wait(self._next_delay())
+            self._wakeup.clear()
+            if self._stop.is_set() or not self._interval():
+                continue
+
+            # Не конкурируем с командой пользователя за сеть и блокировки git
+            with self._idle:
+                while self._foreground and not self._stop.is_set():
+                    self._idle.wait()
+                if self._stop.is_set():
+                    break
+                self._busy = True
+            try:
+                self.prefetch_once()
+            finally:
+                with self._idle:
+                    self._busy = False
+                    self._idle.notify_all()
+
+    def _existing_branches(self, work_dir: str, remote: str) -> List[str]:
+        # Основная ветка определяется так же, как для сброса: по HEAD remote, иначе main/master
+        branches = dict.fromkeys((resolve_default_branch(work_dir, remote), self.UNSTABLE_BRANCH))
+        refs = [f"refs/remotes/{remote}/{branch}" for branch in branches]
+        result = subprocess.run(
+            ["git", "for-each-ref", "--format=%(refname)"] + refs,
+            cwd=work_dir,
+            capture_output=True,
+            text=True
+        )
+        prefix = f"refs/remotes/{remote}/"
+        return [line[len(prefix):] for line in result.stdout.split()]
+
+    def prefetch_once(self) -> Dict[str, Any]:
+        """Один проход предзагрузки; обновляет счетчик ошибок для backoff"""
+        current_settings = self.config.get_current_settings()
+        if not current_settings:
+            return {"ok": False, "branches": []}
+
+        work_dir = current_settings["WorkDir"]
+        remote = current_settings.get("Remote", "origin")
+        try:
+            branches = self._existing_branches(work_dir, remote)
+            if not branches:
+                return {"ok": True, "branches": []}
+
+            refspecs = [f"+refs/heads/{branch}:refs/remotes/{remote}/{branch}" for branch in branches]
+            # Фоновый fetch не должен спрашивать пароль поверх REPL
+            env = dict(os.environ, GIT_TERMINAL_PROMPT="0")
+            if self.ssh:
+                env.update(self.ssh.git_env(work_dir, remote, batch=True))
+            process = subprocess.run(
+                # Как и git maintenance: FETCH_HEAD пользователя фоновый fetch не трогает
+                ["git", "fetch", "--prefetch", "--no-tags", "--no-write-fetch-head", "--quiet", remote] + refspecs,
+                cwd=work_dir,
+                stdin=subprocess.DEVNULL,
+                capture_output=True,
+                text=True,
+                env=env
+            )
+        except OSError as e:
+            process = None
+            self.last_error = str(e)
+
+        if process is not None and process.returncode == 0:
+            self._failures = 0
+            self.last_success = time.time()
+            self.last_error = None
+            return {"ok": True, "branches": branches}
+
+        if process is not None:
+            self.last_error = process.stderr.strip()
+        self._failures += 1
+        return {"ok": False, "branches": []}
@@ -0,0 +1,227 @@
+import json
+import os
+import subprocess
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional
+from .cache import atomic_write_json, file_lock
+
+
+class PushQueue:
+    """Фоновая очередь push: REPL не ждет сетевого обмена с remote.
+
+    Задания — обновления ссылок (push ветки или удаление remote-ветки).
+    Готовые задания для одного remote отправляются одним `git push`.
+    После ошибки задание повторяется с экспоненциальной задержкой, после
+    MAX_ATTEMPTS попыток ошибка показывается перед следующим приглашением.
+    Очередь хранится в журнале на диске и переживает перезапуск утилиты.
+
+    Журнал общий для всех запущенных экземпляров утилиты: каждое его
+    изменение — чтение и запись под блокировкой push_queue.json.lock, а
+    отправляет задания только экземпляр, захвативший push_queue.lock.
+    """
+
+    MAX_ATTEMPTS = 6
+    BASE_DELAY = 5
+    MAX_DELAY = 600
+    # Как часто перечитывать журнал: задания мог добавить другой экземпляр
+    POLL_INTERVAL = 30
+
+    def __init__(self, config, ssh=None):
+        self.config = config
+        self.ssh = ssh
+        self.journal_file = config.cache_dir / 'push_queue.json'
+        self.journal_lock = config.cache_dir / 'push_queue.json.lock'
+        self.worker_lock = config.cache_dir / 'push_queue.lock'
+        self._cond = threading.Condition()
+        self._jobs = []  # type: List[Dict[str, Any]]
+        self._failures = []  # type: List[Dict[str, Any]]
+        self._thread = None  # type: Optional[threading.Thread]
+        self._stopped = False
+        self._reload()
+
+    def _load(self) -> List[Dict[str, Any]]:
+        try:
+            with open(self.journal_file, 'r', encoding='utf-8') as f:
+                jobs = json.load(f)
+        except (OSError, ValueError):
+            return []
+        jobs = [job for job in jobs if isinstance(job, dict) and "branch" in job]
+        for job in jobs:
+            # Задания из старых журналов: на ветку в очереди одно задание, ее ключа достаточно
+            job.setdefault("id", "\0".join((job["work_dir"], job["remote"], job["branch"])))
+        return jobs
+
+    def _save(self):
+        """Записывает журнал; вызывается под блокировкой журнала"""
+        try:
+            atomic_write_json(self.journal_file, self._jobs)
+        except OSError as e:
+            print(f"Error saving push queue: {e}")
+
+    def _reload(self):
+        """Перечитывает журнал с диска; изменения других экземпляров становятся видны"""
+        with self._cond:
+            try:
+                with file_lock(self.journal_lock):
+                    self._jobs = self._load()
+            except OSError:
+                pass
+    def start(self):
+        """Запускает поток очереди (задания из журнала продолжаются после перезапуска)"""
+        with self._cond:
+            self._stopped = False
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name="git-push", daemon=True)
+                self._thread.start()
+
+    def stop(self):
+        with self._cond:
+            self._stopped = True
+            self._cond.notify_all()
+
+    def enqueue(self, work_dir: str, remote: str, branch: str, delete: bool = False):
+        """Ставит в очередь push ветки (с -u) или удаление remote-ветки.
+
+        Новое задание для той же ветки заменяет ожидающее: важно только
+        последнее намерение пользователя.
+        """
+        job = {
+            "id": uuid.uuid4().hex,
+            "work_dir": work_dir,
+            "remote": remote,
+            "branch": branch,
+            "delete": delete,
+            "attempts": 0,
+            "next_at": 0,
+            "error": ""
+        }
+        with self._cond:
+            with file_lock(self.journal_lock):
+                self._jobs = [
+                    j for j in self._load()
+                    if (j["work_dir"], j["remote"], j["branch"]) != (work_dir, remote, branch)
+                ]
+                self._jobs.append(job)
+                self._save()
+            self._cond.notify_all()
+        self.start()
+
+    def pending_count(self) -> int:
+        with self._cond:
+            return len(self._jobs)
+
+    def status(self) -> Dict[str, int]:
+        """Состояние очереди для приглашения ввода"""
+        with self._cond:
+            return {
+                "pending": len(self._jobs),
+                "retrying": sum(1 for job in self._jobs if job["attempts"])
+            }
+
+    def pop_failures(self) -> List[Dict[str, Any]]:
+        """Возвращает и очищает задания, исчерпавшие попытки"""
+        with self._cond:
+            failures, self._failures = self._failures, []
+        return failures
+
+    def _wait_due(self) -> bool:
+        """Ждет готовых заданий; False, если очередь остановлена"""
+        with self._cond:
+            while not self._stopped:
+                now = time.time()
+                if any(job["next_at"] <= now for job in self._jobs):
+                    return True
+                next_at = min((job["next_at"] for job in self._jobs), default=now + self.POLL_INTERVAL)
+                if not self._cond.wait(min(next_at - now, self.POLL_INTERVAL)):
+                    self._reload()
+            return False
+
+    def _run(self):
+        while self._wait_due():
+            # Два экземпляра утилиты не должны отправлять одни и те же задания дважды
+            with file_lock(self.worker_lock, blocking=False) as owner:
+                if owner:
+                    self._process_due()
+                    continue
+            # Очередь обрабатывает другой экземпляр: следим за журналом, пока он не освободится
+            with self._cond:
+                if not self._stopped:
+                    self._cond.wait(self.BASE_DELAY)
+            self._reload()
+
+    def _process_due(self):
+        """Отправляет готовые задания; вызывается под блокировкой обработчика очереди"""
+        self._reload()
+        now = time.time()
+        with self._cond:
+            due = [dict(job) for job in self._jobs if job["next_at"] <= now]
+
+        batches = OrderedDict()
+        for job in due:
+            batches.setdefault((job["work_dir"], job["remote"]), []).append(job)
+
+        for (work_dir, remote), jobs in batches.items():
+            results = self._push_batch(work_dir, remote, jobs)
+            # Одна плохая ссылка отменяет весь push: повторяем по одной, чтобы не задерживать остальные
+            if len(jobs) > 1 and not all(error is None for error in results.values()):
+                for job in jobs:
+                    results.update(self._push_batch(work_dir, remote, [job]))
+            self._complete(results)
+
+    def _push_batch(self, work_dir: str, remote: str, jobs: List[Dict[str, Any]]) -> Dict[str, Optional[str]]:
+        """Один `git push` для пачки заданий; возвращает ошибку (или None) по id задания"""
+        refspecs = [f":{job['branch']}" if job["delete"] else job["branch"] for job in jobs]
+        args = ["git", "push"]
+        if any(not job["delete"] for job in jobs):
+            args.append("-u")
+        try:
+            # Запрос пароля в терминале сломал бы REPL: пусть лучше push завершится ошибкой
+            env = dict(os.environ, GIT_TERMINAL_PROMPT="0")
+            if self.ssh:
+                env.update(self.ssh.git_env(work_dir, remote, batch=True))
+            process = subprocess.run(
+                args + [remote] + refspecs,
+                cwd=work_dir,
+                stdin=subprocess.DEVNULL,
+                capture_output=True,
+                text=True,
+                env=env
+            )
+        except OSError as e:
+            return {job["id"]: str(e) for job in jobs}
+
+        if process.returncode == 0:
+            return {job["id"]: None for job in jobs}
+
+        error = process.stderr.strip()
+        # Remote-ветки уже нет — удаление фактически выполнено
+        if len(jobs) == 1 and jobs[0]["delete"] and "remote ref does not exist" in error:
+            return {jobs[0]["id"]: None}
+        return {job["id"]: error for job in jobs}
+
+    def _complete(self, results: Dict[str, Optional[str]]):
+        now = time.time()
+        with self._cond:
+            with file_lock(self.journal_lock):
+                # Журнал перечитывается: пока шел push, задания могли добавить или заменить
+                self._jobs = self._load()
+                for job in list(self._jobs):
+                    if job["id"] not in results:
+                        continue
+                    error = results[job["id"]]
+                    if error is None:
+                        self._jobs.remove(job)
+                        continue
+
+                    job["attempts"] += 1
+                    job["error"] = error
+                    if job["attempts"] >= self.MAX_ATTEMPTS:
+                        self._jobs.remove(job)
+                        self._failures.append(job)
+                    else:
+                        job["next_at"] = now + min(self.BASE_DELAY * 2 ** (job["attempts"] - 1), self.MAX_DELAY)
+                self._save()
+            self._cond.notify_all()
@@ -0,0 +1,240 @@
+import json
+import os
+import signal
+import subprocess
+import threading
+import time
+from typing import Any, Dict, List, Optional, Tuple
+from rich.text import Text
+from .cache import RepoCache
+from .npm import expand_workspaces, workspace_patterns
+
+
+class ScriptIndex:
+    """Индекс npm-скриптов корня и всех workspaces.
+
+    Разобранные package.json хранятся в памяти и перечитываются, только если
+    у файла изменились mtime или размер. Для каждого скрипта в кеше
+    репозитория копятся время последнего запуска и длительности успешных
+    запусков: по ним меню показывает ожидаемое время и ставит недавно
+    использованные скрипты первыми.
+    """
+
+    HISTORY = 5
+
+    def __init__(self, config):
+        self.config = config
+        self.stats = RepoCache(config, "npm_scripts", max_entries=512)
+        self._files = {}  # type: Dict[str, Tuple[int, int, Dict[str, Any]]]
+
+    def _package(self, path: str) -> Optional[Dict[str, Any]]:
+        """package.json по пути, из памяти, если файл не менялся"""
+        try:
+            stat = os.stat(path)
+        except OSError:
+            self._files.pop(path, None)
+            return None
+        cached = self._files.get(path)
+        if cached and cached[0] == stat.st_mtime_ns and cached[1] == stat.st_size:
+            return cached[2]
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return None
+        if not isinstance(data, dict):
+            return None
+        self._files[path] = (stat.st_mtime_ns, stat.st_size, data)
+        return data
+
+    @staticmethod
+    def key(workspace: str, name: str) -> str:
+        return f"{workspace}:{name}" if workspace else name
+
+    def scripts(self, work_dir: str) -> Optional[List[Dict[str, Any]]]:
+        """Скрипты корня и workspaces, недавно запускавшиеся — первыми; None без package.json"""
+        root = self._package(os.path.join(work_dir, "package.json"))
+        if root is None:
+            return None
+
+        packages = [("", root)]
+        for workspace in expand_workspaces(work_dir, workspace_patterns(root)):
+            package = self._package(os.path.join(work_dir, workspace, "package.json"))
+            if package is not None:
+                packages.append((workspace, package))
+
+        entries = []
+        for workspace, package in packages:
+            scripts = package.get("scripts") or {}
+            if not isinstance(scripts, dict):
+                continue
+            for name, command in scripts.items():
+                stats = self.stats.get(self.key(workspace, name), work_dir=work_dir) or {}
+                durations = stats.get("durations") or []
+                entries.append({
+                    "workspace": workspace,
+                    "name": name,
+                    "command": str(command),
+                    "last_used": stats.get("last_used", 0),
+                    "expected": sum(durations) / len(durations) if durations else None
+                })
+        # sorted устойчив: скрипты без истории остаются в порядке package.json
+        return sorted(entries, key=lambda entry: -entry["last_used"])
+
+    def record_start(self, work_dir: str, workspace: str, name: str):
+        key = self.key(workspace, name)
+        stats = dict(self.stats.get(key, work_dir=work_dir) or {}, last_used=time.time())
+        self.stats.set(key, stats, work_dir=work_dir)
+
+    def record_result(self, work_dir: str, workspace: str, name: str, elapsed: float, returncode: int):
+        """Длительность учитывается только у успешных запусков: упавший скрипт ничего не говорит о времени"""
+        if returncode != 0:
+            return
+        key = self.key(workspace, name)
+        stats = dict(self.stats.get(key, work_dir=work_dir) or {})
+        stats["durations"] = (stats.get("durations") or [])[-(self.HISTORY - 1):] + [round(elapsed, 2)]
+        self.stats.set(key, stats, work_dir=work_dir)
+
+
+class ScriptRunner:
+    """Параллельный запуск npm-скриптов внутри утилиты.
+
+    Каждый скрипт — отдельный `npm run` в своей группе процессов; его
+    stdout и stderr читаются фоновым потоком и печатаются в консоль
+    построчно с цветным префиксом [имя]. Ввод команд не блокируется:
+    пока скрипты работают, их число видно в приглашении, остановить все
+    можно командой `x`. Код возврата и длительность каждого скрипта
+    сводятся в итог после завершения последнего из них.
+    """
+
+    PREFIX_STYLES = ("cyan", "magenta", "green", "yellow", "blue", "bright_red")
+    STOP_TIMEOUT = 5
+
+    def __init__(self, config, locale, console, index: ScriptIndex):
+        self.config = config
+        self.locale = locale
+        self.console = console
+        self.index = index
+        self._lock = threading.Lock()
+        self._running = {}  # type: Dict[str, Dict[str, Any]]
+        self._finished = []  # type: List[Dict[str, Any]]
+        self._results = []  # type: List[List[Dict[str, Any]]]
+
+    def start(self, scripts: List[Dict[str, Any]]) -> Dict[str, str]:
+        """Запускает скрипты ({"workspace", "name"}) текущего профиля; возвращает ошибки по меткам незапущенных"""
+        current_settings = self.config.get_current_settings()
+        if not current_settings:
+            return {}
+        work_dir = current_settings["WorkDir"]
+        npm_cmd = "npm.cmd" if os.name == 'nt' else "npm"
+        labels = [ScriptIndex.key(script["workspace"], script["name"]) for script in scripts]
+        width = max(len(label) for label in labels)
+
+        errors = {}
+        for index, (script, label) in enumerate(zip(scripts, labels)):
+            with self._lock:
+                if label in self._running:
+                    errors[label] = self.locale.tr('scripts.already_running')
+                    continue
+            args = [npm_cmd, "run", script["name"]]
+            if script["workspace"]:
+                args.append(f"--workspace={script['workspace']}")
+            # Отдельная группа процессов: остановка должна задеть и дочерние процессы скрипта
+            if os.name == 'nt':
+                group = {"creationflags": subprocess.CREATE_NEW_PROCESS_GROUP}
+            else:
+                group = {"start_new_session": True}
+            try:
+                process = subprocess.Popen(
+                    args,
+                    cwd=work_dir,
+                    stdin=subprocess.DEVNULL,
+                    stdout=subprocess.PIPE,
+                    stderr=subprocess.STDOUT,
+                    env=dict(os.environ, FORCE_COLOR="1"),
+                    **group
+                )
+            except OSError as e:
+                errors[label] = str(e)
+                continue
+
+            self.index.record_start(work_dir, script["workspace"], script["name"])
+            job = {
+                "name": label,
+                "script": script,
+                "work_dir": work_dir,
+                "process": process,
+                "prefix": Text(f"[{label}]".ljust(width + 2) + " ", style=self.PREFIX_STYLES[index % len(self.PREFIX_STYLES)]),
+                "started": time.time(),
+                "stopped": False
+            }
+            with self._lock:
+                self._running[label] = job
+            threading.Thread(target=self._pump, args=(job,), name=f"npm-run-{label}", daemon=True).start()
+        return errors
+
+    def _pump(self, job: Dict[str, Any]):
+        process = job["process"]
+        result = {"name": job["name"], "returncode": None, "elapsed": 0.0, "stopped": job["stopped"]}
+        try:
+            for raw in iter(process.stdout.readline, b""):
+                line = raw.decode('utf-8', errors='replace').rstrip("\r\n")
+                if not line.strip():
+                    continue
+                self.console.print(job["prefix"] + Text.from_ansi(line), highlight=False, soft_wrap=True)
+            returncode = process.wait()
+
+            result.update(returncode=returncode, elapsed=time.time() - job["started"], stopped=job["stopped"])
+            if not job["stopped"]:
+                # Статистика пишется в репозиторий, где скрипт запускался, а не в текущий профиль
+                self.index.record_result(job["work_dir"], job["script"]["workspace"], job["script"]["name"],
+                                         result["elapsed"], returncode)
+            style = "green" if returncode == 0 else "yellow" if job["stopped"] else "red"
+            self.console.print(job["prefix"] + Text(self.locale.tr('scripts.exited').format(returncode, result["elapsed"]), style=style))
+        finally:
+            # Что бы ни случилось выше, задание не должно остаться «запущенным» навсегда
+            with self._lock:
+                del self._running[job["name"]]
+                self._finished.append(result)
+                # Итог выдается целиком, когда отработали все одновременно запущенные скрипты
+                if not self._running:
+                    self._results.append(self._finished)
+                    self._finished = []
+
+    def running(self) -> List[str]:
+        with self._lock:
+            return list(self._running)
+
+    def stop(self) -> int:
+        """Останавливает все запущенные скрипты вместе с их дочерними процессами"""
+        with self._lock:
+            jobs = list(self._running.values())
+        for job in jobs:
+            job["stopped"] = True
+            self._terminate(job["process"])
+
+        deadline = time.time() + self.STOP_TIMEOUT
+        for job in jobs:
+            try:
+                job["process"].wait(timeout=max(0, deadline - time.time()))
+            except subprocess.TimeoutExpired:
+                self._terminate(job["process"], force=True)
+        return len(jobs)
+
+    def _terminate(self, process: subprocess.Popen, force: bool = False):
+        if process.poll() is not None:
+            return
+        try:
+            if os.name == 'nt':
+                # taskkill /T — единственный надежный способ завершить дерево процессов cmd/npm
+                subprocess.run(["taskkill", "/T", "/F", "/PID", str(process.pid)], capture_output=True)
+            else:
+                os.killpg(process.pid, signal.SIGKILL if force else signal.SIGTERM)
+        except OSError:
+            pass
+
+    def pop_results(self) -> List[List[Dict[str, Any]]]:
+        """Возвращает и очищает итоги завершившихся запусков"""
+        with self._lock:
+            results, self._results = self._results, []
+        return results
@@ -0,0 +1,94 @@
+import os
+import subprocess
+from typing import Any, Dict, List, Optional
+
+ZERO_OID = "0" * 40
+
+
+class SparseCheckout:
+    """Режим монорепозитория: sparse-checkout по конусам и blobless partial clone.
+
+    Настройки профиля SparsePaths и PartialClone переносятся в конфигурацию
+    репозитория, после чего их учитывают все checkout/reset/switch утилиты,
+    а fetch перестает скачивать содержимое файлов вне рабочего дерева.
+    """
+
+    def __init__(self, config):
+        self.config = config
+
+    def _git(self, work_dir: str, *args: str, input: Optional[str] = None, env: Optional[Dict[str, str]] = None) -> subprocess.CompletedProcess:
+        return subprocess.run(
+            ["git"] + list(args),
+            cwd=work_dir,
+            input=input,
+            capture_output=True,
+            text=True,
+            env=dict(os.environ, **env) if env else None
+        )
+
+    def _work_dir(self) -> Optional[str]:
+        current_settings = self.config.get_current_settings()
+        return current_settings["WorkDir"] if current_settings else None
+
+    def is_sparse(self, work_dir: str) -> bool:
+        return self._git(work_dir, "config", "--bool", "core.sparseCheckout").stdout.strip() == "true"
+
+    def apply(self) -> Optional[str]:
+        """Приводит репозиторий в соответствие с настройками профиля; возвращает ошибку или None"""
+        work_dir = self._work_dir()
+        if not work_dir:
+            return None
+
+        current_settings = self.config.get_current_settings()
+        remote = current_settings.get("Remote", "origin")
+        if self.config.get_option("PartialClone"):
+            # Существующий клон становится blobless: следующие fetch идут с --filter=blob:none,
+            # недостающее содержимое файлов догружается при checkout
+            for key, value in (("promisor", "true"), ("partialclonefilter", "blob:none")):
+                result = self._git(work_dir, "config", f"remote.{remote}.{key}", value)
+                if result.returncode != 0:
+                    return result.stderr.strip()
+        else:
+            # promisor остается: без него уже пропущенные объекты нельзя будет догрузить
+            self._git(work_dir, "config", "--unset", f"remote.{remote}.partialclonefilter")
+
+        paths = self.config.get_option("SparsePaths")
+        if paths:
+            result = self._git(work_dir, "sparse-checkout", "set", "--cone", *paths)
+        elif self.is_sparse(work_dir):
+            result = self._git(work_dir, "sparse-checkout", "disable")
+        else:
+            return None
+        return result.stderr.strip() if result.returncode != 0 else None
+
+    def _pathspecs(self, work_dir: str) -> List[str]:
+        """Pathspec рабочего дерева: файлы корня и директории конусов"""
+        if not self.is_sparse(work_dir):
+            return []
+        cones = self._git(work_dir, "sparse-checkout", "list").stdout.split("\n")
+        return [":(glob)*"] + [cone for cone in cones if cone]
+
+    def update_stats(self, old: Optional[str], new: Optional[str]) -> Optional[Dict[str, Any]]:
+        """Сколько файлов и байт рабочего дерева затронул переход old -> new"""
+        work_dir = self._work_dir()
+        if not work_dir or not old or not new:
+            return None
+
+        pathspecs = self._pathspecs(work_dir)
+        diff = self._git(work_dir, "diff", "--raw", "-z", "--no-renames", "--no-abbrev", old, new, "--", *pathspecs)
+        if diff.returncode != 0:
+            return None
+
+        # Формат -z: ":old_mode new_mode old_oid new_oid status\0path\0"
+        fields = diff.stdout.split("\0")
+        new_oids = [fields[i].split()[3] for i in range(0, len(fields) - 1, 2) if fields[i].startswith(":")]
+
+        total_bytes = 0
+        blobs = [oid for oid in new_oids if oid != ZERO_OID]
+        if blobs:
+            # Без ленивой догрузки: размеры нужны только у того, что уже лежит на диске
+            sizes = self._git(work_dir, "cat-file", "--batch-check=%(objectsize)",
+                              input="\n".join(blobs) + "\n", env={"GIT_NO_LAZY_FETCH": "1"})
+            total_bytes = sum(int(line) for line in sizes.stdout.split() if line.isdigit())
+
+        return {"files": len(new_oids), "bytes": total_bytes, "sparse": bool(pathspecs)}
@@ -0,0 +1,122 @@
+import atexit
+import os
+import re
+import shlex
+import shutil
+import subprocess
+import tempfile
+import threading
+from typing import Dict, Optional, Tuple
+
+# ssh://[user@]host[:port]/path и scp-подобный [user@]host:path
+SSH_URL_PATTERN = re.compile(r'^ssh://(?:(?P<user>[^@/]+)@)?(?P<host>[^:/]+)(?::(?P<port>\d+))?/')
+SCP_URL_PATTERN = re.compile(r'^(?:(?P<user>[^@/:]+)@)?(?P<host>[^:/]{2,}):(?!//)')
+
+
+class SshMultiplexer:
+    """Общие SSH-соединения (ControlMaster) для git-процессов самой утилиты.
+
+    GIT_SSH_COMMAND с параметрами мультиплексирования подставляется только в
+    окружение запускаемых утилитой процессов, глобальные настройки ssh и git
+    не меняются. Мастер-соединение создается лениво первым же git-процессом
+    (ControlMaster=auto), закрывается самим ssh после простоя
+    (ControlPersist) и принудительно — при выходе из утилиты.
+    """
+
+    # Сколько секунд простоя держать мастер-соединение
+    IDLE_TIMEOUT = 600
+
+    def __init__(self, config):
+        self.config = config
+        self._lock = threading.Lock()
+        self._socket_dir = None  # type: Optional[str]
+        self._remotes = {}  # type: Dict[Tuple[str, str], Optional[Dict[str, str]]]
+        self._hosts = {}  # type: Dict[Tuple[Optional[str], str, Optional[str]], str]
+        # Неинтерактивные подкоманды и выход по исключению минуют конец main()
+        atexit.register(self.shutdown)
+
+    def enabled(self) -> bool:
+        # OpenSSH для Windows не поддерживает ControlMaster
+        return os.name != 'nt' and bool(self.config.get_option("SshMultiplex"))
+
+    def _git_output(self, work_dir: str, *args: str) -> str:
+        try:
+            result = subprocess.run(["git"] + list(args), cwd=work_dir, capture_output=True, text=True)
+        except OSError:
+            return ""
+        return result.stdout.strip() if result.returncode == 0 else ""
+
+    def _remote_info(self, work_dir: str, remote: str) -> Optional[Dict[str, str]]:
+        """Хост и базовая команда ssh для remote; None, если remote не по SSH"""
+        key = (os.path.abspath(work_dir), remote)
+        if key not in self._remotes:
+            url = self._git_output(work_dir, "remote", "get-url", remote)
+            match = SSH_URL_PATTERN.match(url) or SCP_URL_PATTERN.match(url)
+            info = None
+            if match:
+                # Уважаем пользовательскую команду ssh: мультиплексирование добавляется к ней
+                base = os.environ.get("GIT_SSH_COMMAND") or self._git_output(work_dir, "config", "core.sshCommand") or "ssh"
+                info = {
+                    "user": match.group("user"),
+                    "host": match.group("host"),
+                    "port": match.groupdict().get("port"),
+                    "base": base
+                }
+            self._remotes[key] = info
+        return self._remotes[key]
+
+    def _ensure_socket_dir(self) -> str:
+        with self._lock:
+            if self._socket_dir is None:
+                # Короткий путь: длина пути unix-сокета ограничена ~100 символами
+                self._socket_dir = tempfile.mkdtemp(prefix="gt-ssh-")
+                os.chmod(self._socket_dir, 0o700)
+            return self._socket_dir
+
+    def git_env(self, work_dir: str, remote: str, batch: bool = False) -> Dict[str, str]:
+        """Дополнительные переменные окружения для git-процесса, работающего с remote.
+
+        batch=True — для фоновых процессов: ssh не спрашивает ни пароль, ни
+        passphrase, ни подтверждение ключа хоста (BatchMode=yes). Такой
+        запрос шел бы в /dev/tty в обход GIT_TERMINAL_PROMPT и смешался бы
+        с вводом REPL; вместо него процесс завершается ошибкой.
+        """
+        multiplex = self.enabled()
+        if not multiplex and not batch:
+            return {}
+        info = self._remote_info(work_dir, remote)
+        if not info:
+            return {}
+
+        command = info["base"]
+        if batch:
+            command += " -o BatchMode=yes"
+        if multiplex:
+            control_path = os.path.join(self._ensure_socket_dir(), "%C")
+            with self._lock:
+                self._hosts[(info["user"], info["host"], info["port"])] = info["base"]
+            command += (
+                f" -o ControlMaster=auto -o ControlPath={shlex.quote(control_path)}"
+                f" -o ControlPersist={self.IDLE_TIMEOUT}"
+            )
+        return {"GIT_SSH_COMMAND": command}
+
+    def shutdown(self):
+        """Закрывает мастер-соединения и удаляет каталог сокетов"""
+        with self._lock:
+            socket_dir, self._socket_dir = self._socket_dir, None
+            hosts, self._hosts = self._hosts, {}
+        if socket_dir is None:
+            return
+
+        control_path = os.path.join(socket_dir, "%C")
+        for (user, host, port), base in hosts.items():
+            args = shlex.split(base) + ["-o", f"ControlPath={control_path}", "-O", "exit"]
+            if port:
+                args += ["-p", port]
+            args.append(f"{user}@{host}" if user else host)
+            try:
+                subprocess.run(args, stdin=subprocess.DEVNULL, capture_output=True, timeout=10)
+            except (OSError, subprocess.TimeoutExpired):
+                pass
+        shutil.rmtree(socket_dir, ignore_errors=True)
@@ -9,13 +9,20 @@ from rich.table import Table
 from rich.text import Text
 from rich.box import ROUNDED
 from rich.progress import Progress, SpinnerColumn, TextColumn, BarColumn, TimeRemainingColumn
+from rich.live import Live
+from rich.markup import escape
 from rich.prompt import Prompt
 import random
 import os
+import time
 from tkinter import Tk, filedialog
 from pyreadline3 import Readline
+from datetime import datetime
 from typing import List, Dict, Optional, Callable, Any
 from .localization import LocalizationManager
+from .export import DataExporter
+from .analytics import HistoryAnalytics, CommitClassifier, COMMIT_ICONS
+from .scripts import ScriptIndex
 
 readline = Readline()
 
@@ -27,6 +34,8 @@ class UIManager:
         self.manager = None
         self.console = Console()
         self.history_file = self.config.history_file
+        self.analytics = HistoryAnalytics(config)
+        self.classifier = CommitClassifier()
 
         self.color_codes = {
             "reset": "\033[0m",
@@ -362,6 +371,61 @@ class UIManager:
         """Показывает выполняемую команду"""
         self.console.print(f"[dim]{command}[/dim]")
 
+    def show_fetch_timing(self, fetch_result: Dict[str, Any]):
+        """Показывает длительность fetch и сэкономленное по сравнению с полным fetch время"""
+        if not fetch_result.get("ok"):
+            return
+
+        elapsed = fetch_result["elapsed"]
+        full_elapsed = fetch_result.get("full_elapsed")
+        if fetch_result["mode"] == "targeted" and full_elapsed and full_elapsed > elapsed:
+            self.console.print(f"[dim]{self.locale.tr('fetch.targeted_saved').format(elapsed, full_elapsed, full_elapsed - elapsed)}[/dim]")
+        else:
+            self.console.print(f"[dim]{self.locale.tr('fetch.done').format(fetch_result['mode'], elapsed)}[/dim]")
+
+    @staticmethod
+    def format_size(size: int) -> str:
+        """Размер в байтах в человекочитаемом виде"""
+        for unit in ("B", "KiB", "MiB", "GiB"):
+            if size < 1024 or unit == "GiB":
+                return f"{size:.0f} {unit}" if unit == "B" else f"{size:.1f} {unit}"
+            size /= 1024
+
+    def show_update_stats(self, stats: Optional[Dict[str, Any]]):
+        """Показывает, сколько файлов и байт рабочего дерева затронула операция"""
+        if not stats:
+            return
+        key = 'sparse.touched_sparse' if stats["sparse"] else 'sparse.touched'
+        self.console.print(f"[dim]{self.locale.tr(key).format(stats['files'], self.format_size(stats['bytes']))}[/dim]")
+
+    # Фазы прогресса git -> ключи локализации
+    GIT_PROGRESS_PHASES = {
+        "Enumerating objects": "enumerating",
+        "Counting objects": "counting",
+        "Compressing objects": "compressing",
+        "Receiving objects": "receiving",
+        "Unpacking objects": "unpacking",
+        "Resolving deltas": "resolving",
+        "Updating files": "updating"
+    }
+
+    def git_progress_updater(self, progress: Progress, task, title: str) -> Callable[..., None]:
+        """Возвращает обработчик прогресса git, обновляющий задачу Rich реальными процентами"""
+        def update(phase: str, percent: int, size: Optional[str] = None, rate: Optional[str] = None):
+            phase_key = self.GIT_PROGRESS_PHASES.get(phase)
+            phase_label = self.locale.tr(f"progress.{phase_key}") if phase_key else phase
+            details = f" [dim]{size} | {rate}[/dim]" if size and rate else ""
+            progress.update(task, completed=percent, description=f"[cyan]{title}: {phase_label}{details}")
+        return update
+
+    def track_staged_install(self, progress: Progress, staged):
+        """Показывает фоновую установку зависимостей отдельной строкой в прогрессе сброса"""
+        task = progress.add_task(f"[cyan]{staged.NAME}", total=100)
+
+        def update(stage: str, percent: int):
+            progress.update(task, completed=percent, description=f"[cyan]{staged.NAME}: [dim]{stage}[/dim]")
+        staged.on_progress = update
+
     def create_progress(self, quiet: bool = False) -> Progress:
         """Создает прогресс-бар"""
         if quiet:
@@ -433,7 +497,8 @@ class UIManager:
             'clean': '\033[1;32m',
             'pointer': '\033[1;37m',
             'separator': '\033[38;5;245m',
-            'command_hint': '\033[38;5;244m'
+            'command_hint': '\033[38;5;244m',
+            'pending': '\033[1;33m'
         }
         
         # Собираем основную строку промта
@@ -452,13 +517,34 @@ class UIManager:
                 f"{colors['branch']}{branch}{colors['reset']}"
             )
         
+        # Незавершенные фоновые push: ↑N, красным — если есть повторы после ошибок
+        push_queue = getattr(getattr(self, 'manager', None), 'push_queue', None)
+        if push_queue:
+            queue_status = push_queue.status()
+            if queue_status["pending"]:
+                queue_color = colors['dirty'] if queue_status["retrying"] else colors['pending']
+                main_line.append(f"{colors['separator']} ∷ {queue_color}↑{queue_status['pending']}{colors['reset']}")
+
+        # Фоновая загрузка объектов LFS
+        lfs = getattr(getattr(self, 'manager', None), 'lfs', None)
+        lfs_percent = lfs.status() if lfs else None
+        if lfs_percent is not None:
+            main_line.append(f"{colors['separator']} ∷ {colors['pending']}LFS {lfs_percent}%{colors['reset']}")
+
+        # npm-скрипты, запущенные в фоне
+        scripts = getattr(getattr(self, 'manager', None), 'scripts', None)
+        running = scripts.running() if scripts else []
+        if running:
+            main_line.append(f"{colors['separator']} ∷ {colors['pending']}▶{len(running)}{colors['reset']}")
+
         # Добавляем указатель ввода
         main_line.append(f"{colors['pointer']}> {colors['reset']}")
         
         return "".join(main_line)
 
-    def display_branch_table(self, branch_data: List[Dict[str, Any]], current_branch: Optional[str]):
-        """Отображает таблицу с ветками"""
+    def display_branch_table(self, branch_data: List[Dict[str, Any]], current_branch: Optional[str],
+                             author_stats: Optional[Dict[str, Dict[str, int]]] = None):
+        """Отображает таблицу с ветками; с author_stats колонка автора показывает владение ветками"""
         table = Table(
             title=self.locale.tr("branch.list_title"),
             box=ROUNDED,
@@ -470,7 +556,7 @@ class UIManager:
         table.add_column(self.locale.tr("branch.number"), style="green", width=5)
         table.add_column(self.locale.tr("branch.name"), style="white", min_width=20)
         table.add_column(self.locale.tr("branch.last_commit"), style="dim", width=18)
-        table.add_column(self.locale.tr("branch.author"), style="dim", width=20)
+        table.add_column(self.locale.tr("branch.author"), style="dim", width=30 if author_stats else 20)
 
         for idx, branch in enumerate(branch_data, 1):
             is_current = branch["local_branch"] == current_branch
@@ -487,11 +573,22 @@ class UIManager:
 
             full_branch_text = Text("\n").join([branch_text, remote_text])
 
+            author_text = Text(branch["author"], style="dim")
+            if author_stats and branch["author"] in author_stats:
+                stats = author_stats[branch["author"]]
+                author_text.append("\n")
+                author_text.append(
+                    self.locale.tr("analytics.ownership").format(
+                        stats["branches"], stats["window_commits"], self.analytics.DEFAULT_WINDOW_DAYS
+                    ),
+                    style="yellow"
+                )
+
             table.add_row(
                 f"[green][{idx}][/green]",
                 full_branch_text,
                 f"[dim]{branch['last_commit_relative']}[/dim]",
-                f"[dim]{branch['author']}[/dim]"
+                author_text
             )
 
         self.console.print("\n")
@@ -524,6 +621,9 @@ class UIManager:
 
         """Обрабатывает выбор ветки пользователем"""
         branch_map = {str(idx + 1): branch["local_branch"] for idx, branch in enumerate(branch_data)}
+        self.console.print(f"[dim]{self.locale.tr('compare.hint')}[/dim]")
+        self.console.print(f"[dim]{self.locale.tr('analytics.ownership_hint')}[/dim]")
+        show_ownership = False
 
         while True:
             try:
@@ -532,13 +632,37 @@ class UIManager:
                 if choice.lower() == 'q':
                     break
 
+                # o — показать/скрыть владение ветками в колонке автора
+                if choice.lower() == 'o':
+                    show_ownership = not show_ownership
+                    author_stats = None
+                    if show_ownership:
+                        with self.console.status(f"[cyan]{self.locale.tr('analytics.running')}[/cyan]"):
+                            author_stats = self.analytics.get_author_summary(branch_data)
+                    self.display_branch_table(branch_data, current_branch, author_stats)
+                    continue
+
+                # c<номер> — сравнение ветки с основной без переключения
+                if choice.lower().startswith('c') and choice[1:].strip() in branch_map:
+                    self.show_branch_comparison(branch_map[choice[1:].strip()])
+                    continue
+
                 if choice in branch_map:
                     selected_branch = branch_map[choice]
-                    result = self.git.run_git_command(f"checkout {selected_branch}")
+                    if self.manager.worktrees.enabled():
+                        self._switch_to_worktree(selected_branch)
+                        return
+
+                    old_head = self.git._resolve_commit("HEAD")
+                    returncode, output = self.git.run_git_with_progress(["checkout", selected_branch], env=self.manager.lfs.skip_env())
+                    if returncode != 0 and output:
+                        self.show_error(output)
                     new_branch = self.git.get_current_branch()
 
                     if new_branch == selected_branch:
                         self.show_success(self.locale.tr('branch.switch_success').format(selected_branch))
+                        self.show_update_stats(self.manager.sparse.update_stats(old_head, self.git._resolve_commit("HEAD")))
+                        self.manager.start_lfs_pull()
                         
                         # Проверяем наличие package.json
                         work_dir = current_settings["WorkDir"]
@@ -546,13 +670,13 @@ class UIManager:
 
                         if os.path.isfile(package_json):
                             self.console.print(f"\n[bold yellow]{self.locale.tr("npm.detected")}[/bold yellow]")
-                            self.git._run_npm_install()
+                            self.git._run_npm_install(old_head=old_head)
                         else:
                             self.console.print(f"\n[dim]{self.locale.tr("npm.not_detected")}[/dim]")
                         
                         return
                     else:
-                        self._handle_branch_switch_error(selected_branch, new_branch)
+                        self._handle_branch_switch_error(selected_branch, new_branch, old_head)
                 else:
                     self.show_error(self.locale.tr('errors.invalid_choice'))
 
@@ -560,7 +684,96 @@ class UIManager:
                 self.show_error(f"Error: {str(e)}")
                 break
 
-    def _handle_branch_switch_error(self, selected_branch: str, current_branch: str):
+    def _switch_to_worktree(self, branch: str):
+        """Переключение через пул worktree: вместо checkout меняется WorkDir профиля"""
+        result = self.manager.worktrees.checkout(branch)
+        if "error" in result:
+            self.show_error(self.locale.tr('errors.git_command_failed').format(result["error"] or self.locale.tr('errors.unknown')))
+            return
+
+        self.show_success(self.locale.tr('branch.switch_success').format(branch))
+        self.console.print(f"[dim]{self.locale.tr('worktrees.using').format(result['path'])}[/dim]")
+
+        # Только новому дереву нужны зависимости; в дереве из пула они уже установлены
+        if result["created"] and os.path.isfile(os.path.join(result["path"], "package.json")):
+            self.console.print(f"\n[bold yellow]{self.locale.tr("npm.detected")}[/bold yellow]")
+            self.git._run_npm_install()
+
+        status = self.manager.worktrees.status()
+        if status:
+            self.console.print(f"[dim]{self.locale.tr('worktrees.status').format(status['count'], status['limit'], self.format_size(status['bytes']))}[/dim]")
+
+    def show_branch_comparison(self, branch: str):
+        """Показывает коммиты, уникальные для ветки и основной ветки, и diffstat между ними"""
+        with self.console.status(f"[cyan]{self.locale.tr('compare.loading')}[/cyan]"):
+            comparison = self.git.compare_branches(branch)
+        if not comparison:
+            return
+
+        base = comparison["base"]
+        header = Text()
+        header.append(f"{branch}", style="bold green")
+        header.append(" ↔ ", style="dim")
+        header.append(f"{base}", style="bold cyan")
+        header.append(f"\n{self.locale.tr('compare.merge_base').format(comparison['merge_base'][:10])}", style="dim")
+        if comparison["cached"]:
+            header.append(f"  ({self.locale.tr('compare.cached')})", style="dim italic")
+
+        self.console.print()
+        self.console.print(Panel.fit(header, border_style="blue"))
+
+        for side, name, style in (("ahead", branch, "green"), ("behind", base, "cyan")):
+            commits = comparison[side]
+            table = Table(
+                title=self.locale.tr("compare.only_in").format(name, commits["count"]),
+                box=ROUNDED,
+                header_style=f"bold {style}",
+                border_style="dim"
+            )
+            table.add_column(self.locale.tr("history.hash"), style="bright_green", width=10)
+            table.add_column(self.locale.tr("history.message"), style="white", min_width=30, max_width=60)
+            table.add_column(self.locale.tr("history.author"), style="bright_cyan", width=15)
+            table.add_column(self.locale.tr("history.date"), style="dim", width=16)
+
+            for commit in commits["commits"]:
+                table.add_row(commit["hash"], commit["message"], commit["author"], commit["date"])
+
+            if not commits["commits"]:
+                table.add_row("-", f"[dim]{self.locale.tr('compare.no_commits')}[/dim]", "", "")
+            elif commits["count"] > len(commits["commits"]):
+                hidden = commits["count"] - len(commits["commits"])
+                table.add_row("", f"[dim]{self.locale.tr('compare.more_commits').format(hidden)}[/dim]", "", "")
+
+            self.console.print(table)
+
+        diffstat = comparison["diffstat"]
+        files_table = Table(
+            title=self.locale.tr("compare.files_title"),
+            box=ROUNDED,
+            header_style="bold yellow",
+            border_style="dim"
+        )
+        files_table.add_column(self.locale.tr("compare.file"), style="white", min_width=40)
+        files_table.add_column("+", style="green", justify="right", width=8)
+        files_table.add_column("−", style="red", justify="right", width=8)
+
+        for entry in diffstat["files"]:
+            if entry["binary"]:
+                files_table.add_row(entry["path"], "bin", "bin")
+            else:
+                files_table.add_row(entry["path"], str(entry["added"]), str(entry["deleted"]))
+
+        hidden_files = diffstat["total_files"] - len(diffstat["files"])
+        if hidden_files > 0:
+            files_table.add_row(f"[dim]{self.locale.tr('compare.more_files').format(hidden_files)}[/dim]", "", "")
+
+        files_table.caption = self.locale.tr("compare.totals").format(
+            diffstat["total_files"], diffstat["added"], diffstat["deleted"]
+        )
+        self.console.print(files_table)
+        self.console.print()
+
+    def _handle_branch_switch_error(self, selected_branch: str, current_branch: str, old_head: Optional[str] = None):
         current_settings = self.config.get_current_settings()
         if not current_settings:
             self.show_error(self.locale.tr('errors.no_active_profile'))
@@ -570,7 +783,7 @@ class UIManager:
 
         """Обрабатывает ошибки при переключении ветки"""
         error_panel = Panel(
-            Text(f"{self.locale.tr('branch.switch_failed').format(selected_branch)}\n"
+            Text(f"{self.locale.tr('branch.switch_failed').format(selected_branch, current_branch)}\n"
                  f"{self.locale.tr('branch.current').format(current_branch)}"),
             title="[red]Switch Error[/red]",
             border_style="red",
@@ -605,10 +818,14 @@ class UIManager:
         )
 
         if force_choice == 'y':
-            self.git.run_git_command(f"checkout -f {selected_branch}")
+            returncode, output = self.git.run_git_with_progress(["checkout", "-f", selected_branch], env=self.manager.lfs.skip_env())
+            if returncode != 0 and output:
+                self.show_error(output)
             new_branch = self.git.get_current_branch()
             if new_branch == selected_branch:
                 self.show_success(f"Switched to [bold green]{selected_branch}[/bold green] (forced)")
+                self.show_update_stats(self.manager.sparse.update_stats(old_head, self.git._resolve_commit("HEAD")))
+                self.manager.start_lfs_pull()
 
     def show_git_log(self):
         current_settings = self.config.get_current_settings()
@@ -616,21 +833,6 @@ class UIManager:
             self.show_error(self.locale.tr('errors.no_active_profile'))
             return
 
-        # Иконки для разных типов коммитов
-        commit_icons = {
-            "feat": "✨",
-            "fix": "🐛",
-            "docs": "📚",
-            "style": "🎨",
-            "refactor": "♻️",
-            "test": "🧪",
-            "chore": "🔧",
-            "build": "📦",
-            "ci": "⚙️",
-            "perf": "🚀",
-            "revert": "⏪"
-        }
-
         # Получаем данные без графа с указанием кодировки UTF-8
         log_cmd = [
             "git",
@@ -638,7 +840,7 @@ class UIManager:
             "core.quotepath=false",  # Отключаем квотирование путей
             "log",
             "--all",
-            "--pretty=format:%h|%s|%an|%ad|%d",
+            "--pretty=format:%H%x1f%h%x1f%s%x1f%an%x1f%ad%x1f%d",
             "--date=format:%Y-%m-%d %H:%M",
             "--abbrev-commit",
             "-n20"
@@ -667,6 +869,23 @@ class UIManager:
             self.show_error(self.locale.tr('errors.no_commit_data'))
             return
 
+        records = []
+        for line in log_data.split('\n'):
+            parts = line.split('\x1f')
+            if len(parts) < 6:
+                continue
+            records.append({
+                "hash": parts[0],
+                "short_hash": parts[1].strip()[:7],
+                "message": parts[2].strip(),
+                "author": parts[3].strip(),
+                "date": parts[4].strip(),
+                "refs": parts[5].strip()
+            })
+
+        # Классификация всей пачки за один проход (с кешем по хешу коммита)
+        classifications = self.classifier.classify(records)
+
         table = Table(
             title=f"[bold magenta]{self.locale.tr('history.title')}[/bold magenta]",
             box=ROUNDED,
@@ -683,32 +902,18 @@ class UIManager:
         table.add_column(self.locale.tr("history.date"), style="dim", width=12)
         table.add_column(self.locale.tr("history.refs"), style="yellow", width=20)
 
-        for idx, line in enumerate(log_data.split('\n'), start=1):
-            parts = line.split('|')
-            if len(parts) < 5:
-                continue
-
-            commit_hash = parts[0].strip()[:7] if parts[0] else ""
-            message = parts[1].strip() if len(parts) > 1 else ""
-            author = parts[2].strip() if len(parts) > 2 else ""
-            date = parts[3].strip() if len(parts) > 3 else ""
-            refs = parts[4].strip() if len(parts) > 4 else ""
-
-            icon = "● "
-            for prefix, emoji in commit_icons.items():
-                if message.lower().startswith(prefix):
-                    icon = f"{emoji} "
-                    break
+        for idx, (record, (commit_type, task_start, task_end)) in enumerate(zip(records, classifications), start=1):
+            message = record["message"]
+            refs = record["refs"]
+            icon = f"{COMMIT_ICONS[commit_type]} " if commit_type in COMMIT_ICONS else "● "
 
             message_text = Text()
             message_text.append(icon, style="dim")
 
-            task_match = re.search(r'([A-Z]+-\d+)', message)
-            if task_match:
-                start, end = task_match.span()
-                message_text.append(message[:start])
-                message_text.append(message[start:end], style="bold yellow")
-                message_text.append(message[end:])
+            if task_start >= 0:
+                message_text.append(message[:task_start])
+                message_text.append(message[task_start:task_end], style="bold yellow")
+                message_text.append(message[task_end:])
             else:
                 message_text.append(message)
 
@@ -733,10 +938,10 @@ class UIManager:
 
             table.add_row(
                 str(idx),
-                commit_hash,
+                record["short_hash"],
                 message_text,
-                author,
-                date,
+                record["author"],
+                record["date"],
                 refs_text if refs else "-"
             )
 
@@ -744,6 +949,217 @@ class UIManager:
         self.console.print(table)
         self.console.print()
 
+    def show_export_menu(self):
+        """Экспортирует историю коммитов или данные о ветках в JSONL/CSV"""
+        if not self.config.get_current_settings():
+            self.show_error(self.locale.tr('errors.no_active_profile'))
+            return
+
+        self.console.print(f"\n[bold]{self.locale.tr('export.title')}[/bold]")
+        self.console.print(f"[yellow]1.[/] {self.locale.tr('export.kind_log')}")
+        self.console.print(f"[yellow]2.[/] {self.locale.tr('export.kind_branches')}")
+        kind = {"1": "log", "2": "branches"}.get(input(self.locale.tr("export.select_kind")).strip())
+        if not kind:
+            self.show_error(self.locale.tr('errors.invalid_choice'))
+            return
+
+        fmt = {"1": "jsonl", "2": "csv"}.get(input(self.locale.tr("export.select_format")).strip() or "1")
+        if not fmt:
+            self.show_error(self.locale.tr('errors.invalid_choice'))
+            return
+
+        since = until = None
+        if kind == "log":
+            self.console.print(f"[yellow]1.[/] {self.locale.tr('export.mode_full')}")
+            self.console.print(f"[yellow]2.[/] {self.locale.tr('export.mode_range')}")
+            mode = input(self.locale.tr("export.select_mode")).strip() or "1"
+            if mode == "2":
+                since = input(self.locale.tr("export.enter_since")).strip() or None
+                until = input(self.locale.tr("export.enter_until")).strip() or None
+            elif mode != "1":
+                self.show_error(self.locale.tr('errors.invalid_choice'))
+                return
+
+        default_output = os.path.join(os.getcwd(), f"{kind}-{datetime.now():%Y%m%d-%H%M%S}.{fmt}")
+        output = input(self.locale.tr("export.enter_output").format(default_output)).strip() or default_output
+
+        exporter = DataExporter(self.git)
+        try:
+            with self.console.status(f"[cyan]{self.locale.tr('export.running').format(0)}[/cyan]") as status:
+                count = exporter.export(
+                    kind, fmt, output, since=since, until=until,
+                    on_progress=lambda n: status.update(f"[cyan]{self.locale.tr('export.running').format(n)}[/cyan]")
+                )
+        except subprocess.CalledProcessError as e:
+            self.show_error(self.locale.tr('export.failed').format(e.stderr or self.locale.tr('errors.unknown')))
+            return
+        except (OSError, ValueError) as e:
+            self.show_error(self.locale.tr('export.failed').format(str(e)))
+            return
+
+        self.show_success(self.locale.tr('export.done').format(count, output))
+
+    STALE_BRANCH_DAYS = 90
+
+    def show_analytics(self):
+        """Показывает аналитику по всей истории: авторы, задачи, устаревшие ветки"""
+        with self.console.status(f"[cyan]{self.locale.tr('analytics.running')}[/cyan]"):
+            stats = self.analytics.update_stats()
+            branch_data = self.git._get_branch_data() if stats else []
+            summary = self.analytics.get_author_summary(branch_data, stats) if stats else {}
+        if not stats:
+            if self.config.get_current_settings():
+                self.show_error(self.locale.tr('analytics.failed').format(self.analytics.last_error or self.locale.tr('errors.unknown')))
+            else:
+                self.show_error(self.locale.tr('errors.no_active_profile'))
+            return
+
+        window_days = self.analytics.DEFAULT_WINDOW_DAYS
+        authors_table = Table(
+            title=self.locale.tr("analytics.authors_title"),
+            box=ROUNDED,
+            header_style="bold cyan",
+            border_style="dim"
+        )
+        authors_table.add_column(self.locale.tr("history.author"), style="bright_cyan", min_width=20)
+        authors_table.add_column(self.locale.tr("analytics.commits"), style="white", justify="right")
+        authors_table.add_column("+", style="green", justify="right")
+        authors_table.add_column("−", style="red", justify="right")
+        authors_table.add_column(self.locale.tr("analytics.branches"), style="yellow", justify="right")
+        authors_table.add_column(self.locale.tr("analytics.window").format(window_days), style="dim", justify="right")
+
+        top_authors = sorted(summary.items(), key=lambda item: item[1]["commits"], reverse=True)[:15]
+        for author, author_stats in top_authors:
+            authors_table.add_row(
+                author,
+                str(author_stats["commits"]),
+                str(author_stats["added"]),
+                str(author_stats["deleted"]),
+                str(author_stats["branches"]),
+                f"{author_stats['window_commits']} / +{author_stats['window_added']} −{author_stats['window_deleted']}"
+            )
+
+        tasks_table = Table(
+            title=self.locale.tr("analytics.tasks_title").format(len(stats["tasks"])),
+            box=ROUNDED,
+            header_style="bold yellow",
+            border_style="dim"
+        )
+        tasks_table.add_column(self.locale.tr("analytics.task"), style="bold yellow", width=14)
+        tasks_table.add_column(self.locale.tr("analytics.commits"), style="white", justify="right")
+        tasks_table.add_column(self.locale.tr("branch.last_commit"), style="dim", width=18)
+
+        recent_tasks = sorted(stats["tasks"].items(), key=lambda item: item[1][2], reverse=True)[:15]
+        for task, (commits, _, last_timestamp) in recent_tasks:
+            tasks_table.add_row(task, str(commits), f"{datetime.fromtimestamp(last_timestamp):%Y-%m-%d %H:%M}")
+
+        stale_border = datetime.now().timestamp() - self.STALE_BRANCH_DAYS * 86400
+        stale_branches = [b for b in branch_data if b["last_commit_timestamp"] < stale_border]
+
+        self.console.print()
+        self.console.print(authors_table)
+        self.console.print(tasks_table)
+
+        if stale_branches:
+            stale_table = Table(
+                title=self.locale.tr("analytics.stale_title").format(self.STALE_BRANCH_DAYS),
+                box=ROUNDED,
+                header_style="bold red",
+                border_style="dim"
+            )
+            stale_table.add_column(self.locale.tr("branch.name"), style="white", min_width=20)
+            stale_table.add_column(self.locale.tr("branch.last_commit"), style="dim", width=18)
+            stale_table.add_column(self.locale.tr("branch.author"), style="dim", width=20)
+            for branch in stale_branches:
+                stale_table.add_row(branch["local_branch"], branch["last_commit_relative"], branch["author"])
+            self.console.print(stale_table)
+
+        if stats["workers"]:
+            self.console.print(f"[dim]{self.locale.tr('analytics.summary').format(stats['new_commits'], stats['elapsed'], stats['workers'])}[/dim]")
+        else:
+            self.console.print(f"[dim]{self.locale.tr('analytics.up_to_date').format(stats['commits'], stats['elapsed'])}[/dim]")
+        self.console.print()
+
+    def show_fetch_all(self):
+        """Параллельный fetch всех remote во всех репозиториях профилей с живой таблицей"""
+        fetcher = self.manager.fetcher
+        targets = fetcher.targets()
+        if not targets:
+            self.show_error(self.locale.tr('errors.no_active_profile'))
+            return
+
+        home_dir = os.path.expanduser("~")
+        state = {(t["repo"], t["remote"]): {"phase": None, "percent": 0, "result": None} for t in targets}
+
+        def on_update(target: Dict[str, Any], phase: str, percent: int):
+            entry = state[(target["repo"], target["remote"])]
+            entry["phase"], entry["percent"] = phase, percent
+
+        def on_done(result: Dict[str, Any]):
+            state[(result["repo"], result["remote"])]["result"] = result
+
+        def status_text(target: Dict[str, Any]) -> str:
+            if target["skip"]:
+                return f"[dim]{self.locale.tr(f'fetch_all.{target["skip"]}')}[/dim]"
+            entry = state[(target["repo"], target["remote"])]
+            result = entry["result"]
+            if result:
+                if result["ok"]:
+                    return f"[green]✓ {self.locale.tr('fetch_all.done')}[/green]"
+                return f"[red]✗ {escape(result['error'] or self.locale.tr('errors.unknown'))}[/red]"
+            if entry["phase"] is None:
+                return f"[dim]{self.locale.tr('fetch_all.waiting')}[/dim]"
+            phase_key = self.GIT_PROGRESS_PHASES.get(entry["phase"])
+            phase = self.locale.tr(f"progress.{phase_key}") if phase_key else self.locale.tr('fetch_all.connecting')
+            return f"[cyan]{phase} {entry['percent']}%[/cyan]"
+
+        def render() -> Table:
+            table = Table(title=self.locale.tr("fetch_all.title"), box=ROUNDED, header_style="bold cyan", border_style="dim")
+            table.add_column(self.locale.tr("fetch_all.repo"), style="yellow", min_width=20)
+            table.add_column(self.locale.tr("fetch_all.remote"), style="bright_cyan")
+            table.add_column(self.locale.tr("fetch_all.status"), min_width=24)
+            table.add_column(self.locale.tr("fetch_all.changes"), justify="right")
+            table.add_column(self.locale.tr("fetch_all.time"), style="dim", justify="right")
+            for target in targets:
+                result = state[(target["repo"], target["remote"])]["result"]
+                repo = target["repo"].replace(home_dir, "~", 1) if target["repo"].startswith(home_dir) else target["repo"]
+                table.add_row(
+                    repo,
+                    target["remote"] or "-",
+                    status_text(target),
+                    str(len(result["changes"])) if result and result["ok"] else "",
+                    f"{result['elapsed']:.1f}s" if result and result["elapsed"] else ""
+                )
+            return table
+
+        start_time = time.time()
+        self.console.print()
+        with Live(get_renderable=render, console=self.console, refresh_per_second=8):
+            results = fetcher.fetch_all(on_update, on_done, targets=targets)
+        elapsed = time.time() - start_time
+        self.console.print()
+
+        changes = [(result, change) for result in results for change in result["changes"]]
+        if changes:
+            changes_table = Table(title=self.locale.tr("fetch_all.changes_title"), box=ROUNDED, header_style="bold cyan", border_style="dim")
+            changes_table.add_column(self.locale.tr("fetch_all.repo"), style="yellow")
+            changes_table.add_column(self.locale.tr("fetch_all.ref"), style="white")
+            changes_table.add_column(self.locale.tr("fetch_all.change"), style="dim")
+            for result, change in changes:
+                if change["old"] is None:
+                    change_text = f"[green]{self.locale.tr('fetch_all.new_ref')}[/green] {change['new'][:8]}"
+                elif change["new"] is None:
+                    change_text = f"[red]{self.locale.tr('fetch_all.deleted_ref')}[/red]"
+                else:
+                    change_text = f"{change['old'][:8]}..{change['new'][:8]}"
+                changes_table.add_row(os.path.basename(result["repo"]), change["ref"][len("refs/remotes/"):], change_text)
+            self.console.print(changes_table)
+
+        fetched = [result for result in results if not result["skip"]]
+        failed = sum(1 for result in fetched if not result["ok"])
+        self.console.print(f"[dim]{self.locale.tr('fetch_all.summary').format(len(fetched) - failed, failed, len(changes), elapsed)}[/dim]")
+        self.console.print()
+
     def show_git_status(self):
         """Показывает статус git"""
         status = self.git.run_git_command("status -sb")
@@ -780,6 +1196,10 @@ class UIManager:
             {"key": "w", "description": self.locale.tr("menu.change_directory"), "action": self.change_work_directory},
             {"key": "r", "description": self.locale.tr("menu.change_remote"), "action": self.set_default_remote},
             {"key": "n", "description": self.locale.tr("menu.npm_scripts"), "action": self.show_npm_scripts},
+            {"key": "x", "description": self.locale.tr("menu.stop_scripts"), "action": self.stop_npm_scripts},
+            {"key": "e", "description": self.locale.tr("menu.export"), "action": self.show_export_menu},
+            {"key": "a", "description": self.locale.tr("menu.analytics"), "action": self.show_analytics},
+            {"key": "f", "description": self.locale.tr("menu.fetch_all"), "action": self.show_fetch_all},
             {"key": "p", "description": self.locale.tr("menu.profiles"), "action": self.manager.show_profiles_menu},
             {"key": "l", "description": self.locale.tr("menu.change_language"), "action": self.change_language_interactive},
             {"key": "Q", "description": self.locale.tr("menu.exit"), "action": lambda: None},
@@ -837,6 +1257,10 @@ class UIManager:
             {"key": "w", "description": self.locale.tr("menu.change_directory")},
             {"key": "r", "description": self.locale.tr("menu.change_remote")},
             {"key": "n", "description": self.locale.tr("menu.npm_scripts")},
+            {"key": "x", "description": self.locale.tr("menu.stop_scripts")},
+            {"key": "e", "description": self.locale.tr("menu.export")},
+            {"key": "a", "description": self.locale.tr("menu.analytics")},
+            {"key": "f", "description": self.locale.tr("menu.fetch_all")},
             {"key": "m", "description": self.locale.tr("menu.show_menu")},
             {"key": "p", "description": self.locale.tr("menu.profiles")},
             {"key": "l", "description": self.locale.tr("menu.change_language")},
@@ -1220,60 +1644,73 @@ class UIManager:
             show_lines=True
         )
 
-        table.add_column("#", style="green", width=5)
-        table.add_column(self.locale.tr("npm.script_name"), style="bright_cyan", width=25)
-        table.add_column(self.locale.tr("npm.script_command"), style="white", width=60)
-
-        for idx, (name, cmd) in enumerate(scripts.items(), 1):
-            table.add_row(
-                str(idx),
-                name,
-                cmd
-            )
+        has_workspaces = any(script["workspace"] for script in scripts)
+        table.add_column("#", style="green", min_width=3, no_wrap=True)
+        if has_workspaces:
+            table.add_column(self.locale.tr("scripts.workspace"), style="yellow", no_wrap=True)
+        table.add_column(self.locale.tr("npm.script_name"), style="bright_cyan", no_wrap=True)
+        table.add_column(self.locale.tr("npm.script_command"), style="white", ratio=1)
+        table.add_column(self.locale.tr("scripts.expected"), style="dim", justify="right", no_wrap=True)
+
+        for idx, script in enumerate(scripts, 1):
+            expected = f"~{script['expected']:.1f}s" if script["expected"] is not None else "-"
+            row = [str(idx)]
+            if has_workspaces:
+                row.append(script["workspace"] or "-")
+            table.add_row(*row, script["name"], escape(script["command"]), expected)
 
         self.console.print()
         self.console.print(table)
         self.console.print()
 
         while True:
-            # Исправленная строка с подстановкой количества скриптов
-            choice = input(self.locale.tr("npm.select_script").format(len(scripts))).strip().lower()
+            # Несколько номеров через запятую или пробел запускают скрипты параллельно
+            choice = input(self.locale.tr("npm.select_scripts").format(len(scripts))).strip().lower()
             if choice == 'q':
                 return
 
-            if choice.isdigit() and 1 <= int(choice) <= len(scripts):
-                selected_script = list(scripts.keys())[int(choice)-1]
-                self._run_npm_script(selected_script, scripts[selected_script])
+            parts = [part for part in choice.replace(',', ' ').split() if part]
+            if parts and all(part.isdigit() and 1 <= int(part) <= len(scripts) for part in parts):
+                selected = [scripts[index - 1] for index in dict.fromkeys(int(part) for part in parts)]
+                self._run_npm_scripts(selected)
                 return
             else:
                 self.show_error(self.locale.tr('errors.invalid_choice'))
 
-    def _run_npm_script(self, script_name: str, script_cmd: str):
-        """Запускает npm-скрипт в новом терминале"""
-        current_settings = self.config.get_current_settings()
-        if not current_settings:
-            self.show_error(self.locale.tr('errors.no_active_profile'))
-            return
-
-        work_dir = current_settings["WorkDir"]
-
-        try:
-            if os.name == 'nt':
-                # Для Windows
-                import subprocess
-                subprocess.Popen(
-                    f'start cmd /k "cd /d "{work_dir}" && npm run {script_name} && exit"',
-                    shell=True
-                )
+    def _run_npm_scripts(self, scripts: List[Dict[str, Any]]):
+        """Запускает npm-скрипты в фоне; их вывод идет в консоль с префиксами"""
+        errors = self.manager.scripts.start(scripts)
+        labels = [ScriptIndex.key(script["workspace"], script["name"]) for script in scripts]
+        for label in labels:
+            if label in errors:
+                self.show_error(self.locale.tr('npm.script_error').format(label, errors[label]))
             else:
-                # Для Linux/MacOS
-                import subprocess
-                terminal = os.environ.get('TERMINAL', 'x-terminal-emulator')
-                subprocess.Popen(
-                    f'{terminal} -e "bash -c \'cd "{work_dir}" && npm run {script_name}; exec bash\'"',
-                    shell=True
-                )
+                self.show_success(self.locale.tr('npm.script_started').format(label))
+        if len(errors) < len(labels):
+            self.console.print(f"[dim]{self.locale.tr('scripts.stop_hint')}[/dim]")
+
+    def show_script_results(self, results: List[Dict[str, Any]]):
+        """Итог параллельного запуска: код возврата и длительность каждого скрипта"""
+        table = Table(title=self.locale.tr("scripts.results_title"), box=ROUNDED, header_style="bold cyan", border_style="dim")
+        table.add_column(self.locale.tr("npm.script_name"), style="bright_cyan")
+        table.add_column(self.locale.tr("scripts.exit_code"), justify="right")
+        table.add_column(self.locale.tr("scripts.duration"), justify="right")
+
+        for result in results:
+            if result["stopped"]:
+                status = f"[yellow]{self.locale.tr('scripts.stopped')}[/yellow]"
+            elif result["returncode"] == 0:
+                status = "[green]0[/green]"
+            else:
+                status = f"[red]{result['returncode'] if result['returncode'] is not None else '?'}[/red]"
+            table.add_row(result["name"], status, f"{result['elapsed']:.1f}s")
 
-            self.show_success(self.locale.tr('npm.script_started').format(script_name))
-        except Exception as e:
-            self.show_error(self.locale.tr('npm.script_error').format(script_name, str(e)))
\ No newline at end of file
+        self.console.print(table)
+
+    def stop_npm_scripts(self):
+        """Останавливает запущенные из утилиты npm-скрипты"""
+        if not self.manager.scripts.running():
+            self.show_info(self.locale.tr('scripts.none_running'))
+            return
+        stopped = self.manager.scripts.stop()
+        self.show_success(self.locale.tr('scripts.stopped_count').format(stopped))
\ No newline at end of file
@@ -0,0 +1,175 @@
+import hashlib
+import json
+import os
+import re
+import shutil
+import subprocess
+import threading
+import time
+from pathlib import Path
+from typing import Any, Dict, Optional
+from .cache import atomic_write_json, directory_size
+
+
+class WorktreePool:
+    """Пул git worktree для недавно использованных веток.
+
+    Переключение на ветку из пула — это смена WorkDir профиля: ни checkout,
+    ни npm install не нужны, у каждого worktree свои файлы и node_modules.
+    Пул ограничен числом деревьев (WorktreePool) и размером на диске
+    (WorktreePoolMaxMB); при превышении удаляются давно не использованные
+    чистые деревья. Основной worktree репозитория в пул не входит.
+    """
+
+    def __init__(self, config):
+        self.config = config
+        self._lock = threading.Lock()
+
+    def enabled(self) -> bool:
+        return self._limit() > 0
+
+    def _limit(self) -> int:
+        try:
+            return max(0, int(self.config.get_option("WorktreePool") or 0))
+        except (TypeError, ValueError):
+            return 0
+
+    def _git(self, work_dir: str, *args: str) -> subprocess.CompletedProcess:
+        return subprocess.run(["git"] + list(args), cwd=work_dir, capture_output=True, text=True)
+
+    def _main_dir(self, work_dir: str) -> Optional[str]:
+        """Основной worktree: общий .git всех деревьев лежит в нем"""
+        result = self._git(work_dir, "rev-parse", "--path-format=absolute", "--git-common-dir")
+        return os.path.dirname(result.stdout.strip()) if result.returncode == 0 else None
+
+    def _pool_dir(self, main_dir: str) -> Path:
+        return self.config.cache_dir / "worktrees" / hashlib.sha1(main_dir.encode('utf-8')).hexdigest()[:16]
+
+    def _load(self, pool_dir: Path) -> Dict[str, Dict[str, Any]]:
+        try:
+            with open(pool_dir / "pool.json", 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def _save(self, pool_dir: Path, entries: Dict[str, Dict[str, Any]]):
+        try:
+            atomic_write_json(pool_dir / "pool.json", entries)
+        except OSError as e:
+            print(f"Error saving worktree pool: {e}")
+
+    def _checked_out(self, work_dir: str) -> Dict[str, str]:
+        """Ветка -> путь worktree, где она сейчас выгружена"""
+        result = {}
+        path = None
+        for line in self._git(work_dir, "worktree", "list", "--porcelain").stdout.splitlines():
+            if line.startswith("worktree "):
+                path = line[len("worktree "):]
+            elif line.startswith("branch refs/heads/") and path:
+                result[line[len("branch refs/heads/"):]] = path
+        return result
+
+    def checkout(self, branch: str) -> Dict[str, Any]:
+        """Переключает профиль на worktree с веткой, при необходимости создавая его.
+
+        Возвращает {"path", "created"} или {"error"}.
+        """
+        current_settings = self.config.get_current_settings()
+        if not current_settings:
+            return {"error": None}
+
+        work_dir = current_settings["WorkDir"]
+        main_dir = self._main_dir(work_dir)
+        if not main_dir:
+            return {"error": None}
+        pool_dir = self._pool_dir(main_dir)
+
+        created = False
+        path = self._checked_out(work_dir).get(branch)
+        if path is None:
+            name = re.sub(r'[^\w.-]+', '_', branch)[:60] + "-" + hashlib.sha1(branch.encode('utf-8')).hexdigest()[:8]
+            path = str(pool_dir / name)
+            self._git(main_dir, "worktree", "prune")
+            if os.path.exists(path):
+                # Каталог в пуле, о котором git уже не знает: остаток прерванного создания
+                shutil.rmtree(path, ignore_errors=True)
+            result = self._git(main_dir, "worktree", "add", path, branch)
+            if result.returncode != 0:
+                return {"error": result.stderr.strip()}
+            created = True
+
+        previous = work_dir
+        current_settings["WorkDir"] = path
+        self.config.save_settings()
+
+        with self._lock:
+            entries = self._load(pool_dir)
+            if Path(path).parent == pool_dir:
+                entry = entries.setdefault(branch, {"path": path, "size": 0})
+                entry["path"] = path
+                entry["last_used"] = time.time()
+            self._evict(main_dir, pool_dir, entries, keep=path)
+            self._save(pool_dir, entries)
+
+        # Размеры покинутого и нового дерева пересчитываем в фоне: обход node_modules небыстрый.
+        # Учитываются только деревья пула: основной checkout в пул не входит, и обходить его незачем
+        changed = {previous, path} if created else {previous} - {path}
+        for changed_path in changed:
+            if Path(changed_path).parent == pool_dir:
+                threading.Thread(target=self._refresh_size, args=(pool_dir, changed_path), daemon=True).start()
+        return {"path": path, "created": created}
+
+    def _refresh_size(self, pool_dir: Path, path: str):
+        size = directory_size(path)
+        with self._lock:
+            entries = self._load(pool_dir)
+            for entry in entries.values():
+                if entry["path"] == path:
+                    entry["size"] = size
+                    self._save(pool_dir, entries)
+                    break
+
+    def _is_clean(self, path: str) -> bool:
+        # Игнорируемые файлы (node_modules, сборка) не мешают удалению, неотслеживаемые исходники — мешают
+        result = self._git(path, "status", "--porcelain")
+        return result.returncode == 0 and not result.stdout.strip()
+
+    def _evict(self, main_dir: str, pool_dir: Path, entries: Dict[str, Dict[str, Any]], keep: str):
+        """Удаляет давно не использованные деревья сверх лимитов; вызывается под блокировкой"""
+        for branch in [b for b, e in entries.items() if not os.path.isdir(e["path"])]:
+            del entries[branch]
+
+        try:
+            max_bytes = max(0, int(self.config.get_option("WorktreePoolMaxMB") or 0)) * 1024 * 1024
+        except (TypeError, ValueError):
+            max_bytes = 0
+
+        def over_limit() -> bool:
+            if len(entries) > self._limit():
+                return True
+            return bool(max_bytes) and sum(e.get("size", 0) for e in entries.values()) > max_bytes
+
+        # Незакоммиченные изменения не удаляем никогда: такие деревья просто пропускаются
+        for branch, entry in sorted(entries.items(), key=lambda item: item[1].get("last_used", 0)):
+            if not over_limit():
+                break
+            if entry["path"] == keep or not self._is_clean(entry["path"]):
+                continue
+            if self._git(main_dir, "worktree", "remove", "--force", entry["path"]).returncode == 0:
+                del entries[branch]
+
+    def status(self) -> Optional[Dict[str, Any]]:
+        """Число деревьев в пуле, лимит и занимаемое место (по последним замерам)"""
+        current_settings = self.config.get_current_settings()
+        if not current_settings:
+            return None
+        main_dir = self._main_dir(current_settings["WorkDir"])
+        if not main_dir:
+            return None
+        with self._lock:
+            entries = self._load(self._pool_dir(main_dir))
+        return {
+            "count": len(entries),
+            "limit": self._limit(),
+            "bytes": sum(entry.get("size", 0) for entry in entries.values())
+        }
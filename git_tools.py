@@ -2,6 +2,8 @@
 import os
 import io
 import sys
+import argparse
+import subprocess
 from pathlib import Path
 
 # Проверяем наличие tkinter
@@ -33,6 +35,8 @@ def main():
     manager.ui.show_amiga_banner()  # Новый баннер в стиле Amiga
     print(f"\n{manager.tr('app.help_prompt')}")
 
+    manager.prefetch.start()
+    manager.push_queue.start()
     while True:
         manager.show_prompt()
         try:
@@ -43,44 +47,55 @@ def main():
 
             if command in ['q', 'quit', 'exit']:
                 break
-            elif command in ['h', 'help']:
-                manager.show_key_bindings_help()
-            elif command == '1':
-                manager.reset_master_branch(True)
-            elif command == '2':
-                manager.reset_unstable_branch(True)
-            elif command == '3':
-                manager.soft_reset_to_master(True)
-            elif command == '4':
-                manager.rebase_from_master(True)
-            elif command == '5':
-                manager.new_branch_from_master()
-            elif command == '6':
-                manager.show_branches()
-            elif command == '7':
-                manager.set_branch_prefix()
-            elif command == '8':
-                manager.show_git_log()
-            elif command == '9':
-                manager.show_key_bindings_help()
-            elif command == 's':
-                manager.show_git_status()
-            elif command == 'd':
-                manager.delete_branch()
-            elif command == 'w':
-                manager.change_work_directory()
-            elif command == 'r':
-                manager.set_default_remote()
-            elif command == 'n':
-                manager.ui.show_npm_scripts()
-            elif command == 'p':
-                manager.show_profiles_menu()
-            elif command == 'l':
-                manager.change_language_interactive()
-            elif command == 'm':
-                manager.show_git_actions_menu()
-            else:
-                manager.show_unknown_command(command)
+
+            # Пока выполняется git-команда, фоновые предзагрузка и подстановка файлов LFS не запускаются
+            with manager.foreground(command):
+                if command in ['h', 'help']:
+                    manager.show_key_bindings_help()
+                elif command == '1':
+                    manager.reset_master_branch(True)
+                elif command == '2':
+                    manager.reset_unstable_branch(True)
+                elif command == '3':
+                    manager.soft_reset_to_master(True)
+                elif command == '4':
+                    manager.rebase_from_master(True)
+                elif command == '5':
+                    manager.new_branch_from_master()
+                elif command == '6':
+                    manager.show_branches()
+                elif command == '7':
+                    manager.set_branch_prefix()
+                elif command == '8':
+                    manager.show_git_log()
+                elif command == '9':
+                    manager.show_key_bindings_help()
+                elif command == 's':
+                    manager.show_git_status()
+                elif command == 'd':
+                    manager.delete_branch()
+                elif command == 'w':
+                    manager.change_work_directory()
+                elif command == 'r':
+                    manager.set_default_remote()
+                elif command == 'n':
+                    manager.ui.show_npm_scripts()
+                elif command == 'x':
+                    manager.stop_npm_scripts()
+                elif command == 'e':
+                    manager.show_export_menu()
+                elif command == 'a':
+                    manager.show_analytics()
+                elif command == 'f':
+                    manager.show_fetch_all()
+                elif command == 'p':
+                    manager.show_profiles_menu()
+                elif command == 'l':
+                    manager.change_language_interactive()
+                elif command == 'm':
+                    manager.show_git_actions_menu()
+                else:
+                    manager.show_unknown_command(command)
 
         except KeyboardInterrupt:
             print(f"\n{manager.tr('app.quit_prompt')}")
@@ -89,5 +104,64 @@ def main():
             print(f"\n{manager.tr('app.closing')}")
             break
 
+    manager.config.flush()
+    manager.scripts.stop()
+    manager.prefetch.stop()
+    manager.push_queue.stop()
+    manager.ssh.shutdown()
+    pending = manager.push_queue.pending_count()
+    if pending:
+        print(manager.tr('push.resume_later').format(pending))
+
+def run_cli(argv):
+    """Неинтерактивные подкоманды (например, экспорт для дашбордов)"""
+    from data.export import DataExporter
+
+    parser = argparse.ArgumentParser(prog="git_tools.py")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    export_parser = subparsers.add_parser("export", help="Export commit history or branch data")
+    export_parser.add_argument("kind", choices=DataExporter.KINDS)
+    export_parser.add_argument("-f", "--format", choices=DataExporter.FORMATS, default="jsonl")
+    export_parser.add_argument("-o", "--output", required=True)
+    export_parser.add_argument("--since", help="Only commits after this date (log only)")
+    export_parser.add_argument("--until", help="Only commits before this date (log only)")
+    export_parser.add_argument("--profile", help="Profile to export from (default: current)")
+
+    analytics_parser = subparsers.add_parser("analytics", help="Parse full history in parallel and print timing")
+    analytics_parser.add_argument("--workers", type=int, help="Number of processes (default: all cores)")
+    analytics_parser.add_argument("--profile", help="Profile to analyse (default: current)")
+
+    args = parser.parse_args(argv)
+    manager = GitBranchManager()
+
+    if args.profile:
+        if not manager.config.has_profile(args.profile):
+            print(f"Unknown profile: {args.profile}", file=sys.stderr)
+            return 1
+        manager.config.current_profile = args.profile
+
+    if args.command == "analytics":
+        stats = manager.ui.analytics.collect(workers=args.workers)
+        if stats is None:
+            error = manager.ui.analytics.last_error or manager.tr('errors.unknown')
+            print(manager.tr('analytics.failed').format(error), file=sys.stderr)
+            return 1
+        print(manager.tr('analytics.summary').format(stats['commits'], stats['elapsed'], stats['workers']))
+        return 0
+
+    try:
+        count = DataExporter(manager.git).export(args.kind, args.format, args.output, since=args.since, until=args.until)
+    except subprocess.CalledProcessError as e:
+        print(manager.tr('export.failed').format(e.stderr or manager.tr('errors.unknown')), file=sys.stderr)
+        return 1
+    except (OSError, ValueError) as e:
+        print(manager.tr('export.failed').format(str(e)), file=sys.stderr)
+        return 1
+    print(manager.tr('export.done').format(count, args.output))
+    return 0
+
 if __name__ == "__main__":
+    if len(sys.argv) > 1:
+        sys.exit(run_cli(sys.argv[1:]))
     main()
\ No newline at end of file